@@ -0,0 +1,272 @@
+import logging
+import os
+import pickle
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from extract_excel_data import KEY_COLUMN
+from instrumentation import stage
+from sheet_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Dimensions of the distinct-student count cube
+CUBE_DIMENSIONS = ['YEAR', 'COURSE', 'DURATION', 'GENDER', 'EMPLOYMENT_STATUS', 'PRESENT_STATUS']
+
+# The cube is stored and recomputed per (YEAR, COURSE) partition. STUDENT_KEY includes
+# both columns, so no student is shared between partitions and they are independent.
+PARTITION_COLUMNS = ['YEAR', 'COURSE']
+
+# Monthly income bands in rupees: (inclusive upper bound, label); the last band is open
+INCOME_BANDS = [(0, 'No income'), (5000, 'Up to 5,000'), (10000, '5,001-10,000'), (15000, '10,001-15,000'),
+                (20000, '15,001-20,000'), (np.inf, 'Above 20,000')]
+NOT_REPORTED = 'Not reported'
+INCOME_BAND_ORDER = [label for _, label in INCOME_BANDS] + [NOT_REPORTED]
+
+# Columns of the income quantile table and the quantile each one holds
+INCOME_QUANTILES = {'Q1': 0.25, 'MEDIAN': 0.5, 'Q3': 0.75}
+
+# Key columns of each cube table, in sort order
+TABLE_KEYS = {'counts': CUBE_DIMENSIONS, 'income_bands': PARTITION_COLUMNS + ['INCOME_BAND'],
+              'income_quantiles': PARTITION_COLUMNS}
+
+# Value columns of the per-partition income tables
+INCOME_TABLE_VALUES = {'income_bands': ['STUDENTS'], 'income_quantiles': ['EARNERS'] + list(INCOME_QUANTILES)}
+
+AGGREGATES_FILE = 'aggregates.pkl'
+
+# Bump whenever the layout of the stored cube changes
+CUBE_VERSION = 3
+
+
+def income_band(income):
+    """
+    INCOME_BANDS label of every monthly income, NOT_REPORTED where it is missing
+    """
+    edges = [-np.inf] + [bound for bound, _ in INCOME_BANDS]
+    bands = pd.cut(income.astype('float64'), bins=edges, labels=[label for _, label in INCOME_BANDS])
+    return bands.cat.add_categories([NOT_REPORTED]).fillna(NOT_REPORTED)
+
+
+def build_income_tables(df):
+    """
+    Income aggregates per (YEAR, COURSE) partition from the INCOME column of df:
+    - 'income_bands': distinct students per INCOME_BAND
+    - 'income_quantiles': the number of EARNERS (income above zero) and the
+      INCOME_QUANTILES of their income
+
+    A student with several records counts with the highest income among them.
+    STUDENT_KEY includes YEAR and COURSE, so the bands of a year sum over its courses.
+    """
+    students = df.loc[df[KEY_COLUMN].notna(), PARTITION_COLUMNS + [KEY_COLUMN, 'INCOME']]
+    incomes = students.groupby(PARTITION_COLUMNS + [KEY_COLUMN], observed=True)['INCOME'].max().astype('float64')
+
+    bands = pd.Series(income_band(incomes).to_numpy(), index=incomes.index, name='INCOME_BAND')
+    income_bands = (bands.groupby(level=PARTITION_COLUMNS, observed=True).value_counts()
+                    .reset_index(name='STUDENTS'))
+    income_bands = income_bands[income_bands['STUDENTS'] > 0]
+
+    earners = incomes[incomes > 0].groupby(level=PARTITION_COLUMNS, observed=True)
+    # Without earners, quantile().unstack() has no columns; keep the table's layout
+    quantiles = earners.quantile(list(INCOME_QUANTILES.values())).unstack()
+    quantiles = quantiles.reindex(columns=list(INCOME_QUANTILES.values()))
+    quantiles.columns = list(INCOME_QUANTILES)
+    quantiles.insert(0, 'EARNERS', earners.size())
+    income_quantiles = quantiles.reset_index()
+
+    tables = {'income_bands': income_bands, 'income_quantiles': income_quantiles}
+    for name, table in tables.items():
+        for column in TABLE_KEYS[name]:
+            table[column] = table[column].astype(object)
+        tables[name] = table.sort_values(TABLE_KEYS[name], ignore_index=True)
+    return tables
+
+
+def build_cube(df):
+    """
+    Count distinct students once for every combination of CUBE_DIMENSIONS in df.
+
+    Returns a dict of two DataFrames:
+    - 'counts': one row per cell with the number of distinct STUDENT_KEYs in it
+    - 'overlaps': the (cell, STUDENT_KEY) pairs of students found in more than one
+      cell, e.g. a duplicated record with a different employment status. rollup()
+      uses them so a student is never counted twice in a coarser group.
+
+    When df has an INCOME column, the tables of build_income_tables are added.
+    """
+    with stage('build_cube', rows_in=len(df)) as record:
+        cells = df.loc[df[KEY_COLUMN].notna(), CUBE_DIMENSIONS + [KEY_COLUMN]].drop_duplicates()
+        counts = cells.groupby(CUBE_DIMENSIONS, observed=True, dropna=False).size().reset_index(name='STUDENTS')
+        overlaps = cells[cells[KEY_COLUMN].duplicated(keep=False)].reset_index(drop=True)
+        # Plain values (missing stays missing) so cubes from different runs concatenate cleanly
+        for table in (counts, overlaps):
+            for column in CUBE_DIMENSIONS:
+                table[column] = table[column].astype(object)
+        cube = {'counts': counts, 'overlaps': overlaps}
+        if 'INCOME' in df.columns:
+            cube.update(build_income_tables(df))
+        record['rows_out'] = len(counts)
+    return cube
+
+
+def _matches(table, where):
+    """
+    Boolean mask of the rows of table matching every {column: value or list of values} in where
+    """
+    mask = pd.Series(True, index=table.index)
+    for column, value in (where or {}).items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        mask &= table[column].isin(values)
+    return mask.to_numpy()
+
+
+def rollup(cube, by, where=None, name='count'):
+    """
+    Distinct-student counts per combination of the `by` dimensions, optionally
+    restricted to the cells matching `where`, e.g.
+    rollup(cube, ['YEAR'], where={'EMPLOYMENT_STATUS': 'Employed'}).
+
+    Equivalent to df[filter].groupby(by)[KEY_COLUMN].nunique() on the full frame,
+    sorted by `by`, with missing values dropped like groupby does.
+    """
+    counts, overlaps = cube['counts'], cube['overlaps']
+    if where:
+        counts = counts[_matches(counts, where)]
+        overlaps = overlaps[_matches(overlaps, where)]
+
+    totals = counts.groupby(by)['STUDENTS'].sum()
+    if len(overlaps):
+        # A student in k cells of the same group was counted k times
+        repeats = overlaps.groupby(by + [KEY_COLUMN]).size().sub(1)
+        totals = totals.sub(repeats.groupby(level=by).sum(), fill_value=0).astype('int64')
+    return totals.reset_index(name=name)
+
+
+def partition_table(cube, name, where=None):
+    """
+    A per-partition table of the cube ('income_bands' or 'income_quantiles')
+    restricted to the YEAR and COURSE values of where. Its rows are not split
+    by the other dimensions, so their filters do not apply. Empty when the
+    cube was built without INCOME.
+    """
+    table = cube.get(name)
+    if table is None:
+        return pd.DataFrame(columns=TABLE_KEYS[name] + INCOME_TABLE_VALUES[name])
+    where = {column: value for column, value in (where or {}).items() if column in PARTITION_COLUMNS}
+    return table[_matches(table, where)].reset_index(drop=True)
+
+
+def slice_cube(cube, where):
+    """
+    The part of the cube matching `where`, e.g. {'COURSE': 'Tally'}. Rollups of
+    it give the same counts as the full data filtered the same way.
+    """
+    return {name: table[_matches(table, where)].reset_index(drop=True) for name, table in cube.items()}
+
+
+def export_cube(cube, path):
+    """
+    Write the cube's cell counts for other tools. The format follows the file
+    extension: .parquet, .json (records) or CSV for anything else.
+    """
+    counts = cube['counts']
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        counts.to_parquet(path, index=False)
+    elif extension == '.json':
+        counts.to_json(path, orient='records', indent=2)
+    else:
+        counts.to_csv(path, index=False)
+    logger.info("Aggregation cube (%d cells) exported to '%s'", len(counts), path)
+
+
+def sheet_partitions(df):
+    """
+    Sorted list of the [YEAR, COURSE] partitions a cleaned sheet contributes to
+    """
+    if any(column not in df.columns for column in PARTITION_COLUMNS):
+        return []
+    pairs = df[PARTITION_COLUMNS].dropna().drop_duplicates()
+    return sorted([str(year), str(course)] for year, course in pairs.itertuples(index=False))
+
+
+def _in_partitions(df, partitions):
+    """
+    Boolean mask of the rows of df belonging to any of the given partitions
+    """
+    masks = [(df['YEAR'] == year) & (df['COURSE'] == course) for year, course in partitions]
+    return reduce(lambda a, b: a | b, masks, pd.Series(False, index=df.index)).to_numpy()
+
+
+def _load_aggregates(cache_dir):
+    path = os.path.join(cache_dir, AGGREGATES_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            stored = pickle.load(f)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+    return stored if stored.get('version') == CUBE_VERSION else None
+
+
+def _save_aggregates(aggregates, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, AGGREGATES_FILE)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(aggregates, f)
+    os.replace(path + '.tmp', path)
+
+
+def update_aggregates(sheet_data, combined_df, cache_dir=CACHE_DIR):
+    """
+    Return the aggregation cube of combined_df, recomputing only the (YEAR, COURSE)
+    partitions touched by sheets that are new, changed or removed since the
+    previous run. Sheets are compared by df.attrs['fingerprint'].
+    """
+    stored = _load_aggregates(cache_dir)
+    stored_sources = stored['sources'] if stored else {}
+
+    sources = {}
+    affected = set()
+    for key, df in sheet_data.items():
+        fingerprint = df.attrs.get('fingerprint')
+        previous = stored_sources.get(key)
+        if fingerprint is not None and previous and previous['fingerprint'] == fingerprint:
+            sources[key] = previous
+            continue
+        sources[key] = {'fingerprint': fingerprint, 'partitions': sheet_partitions(df)}
+        affected.update(map(tuple, sources[key]['partitions']))
+        if previous:
+            affected.update(map(tuple, previous['partitions']))
+    for key, previous in stored_sources.items():
+        if key not in sheet_data:
+            affected.update(map(tuple, previous['partitions']))
+
+    all_partitions = set(tuple(p) for source in sources.values() for p in source['partitions'])
+    if stored is None:
+        cube = build_cube(combined_df)
+        affected = all_partitions
+    elif affected:
+        recomputed = build_cube(combined_df[_in_partitions(combined_df, affected)])
+        cube = {}
+        for name, table in stored['cube'].items():
+            kept = table[~_in_partitions(table, affected)]
+            cube[name] = pd.concat([kept, recomputed[name]], ignore_index=True)
+            if name in TABLE_KEYS:
+                cube[name] = cube[name].sort_values(TABLE_KEYS[name], ignore_index=True)
+    else:
+        cube = stored['cube']
+
+    if stored is None or affected:
+        _save_aggregates({'version': CUBE_VERSION, 'sources': sources, 'cube': cube}, cache_dir)
+
+    logger.info("Aggregates: %d of %d (year, course) partitions recomputed, %d reused",
+                len(affected), len(all_partitions), len(all_partitions - affected))
+    if stored is not None:
+        for year, course in sorted(affected):
+            logger.info("  recomputed: %s / %s", year, course)
+
+    return cube
@@ -0,0 +1,151 @@
+"""
+Benchmark the batched course charts against one trace per course / course+duration.
+
+Builds charts 2, 3 and 7 of the dashboard both ways from a synthetic cube with
+many course variants and reports build time, trace count and HTML size (without
+the plotly.js bundle, which is the same for both).
+
+Usage:
+    python benchmarks/bench_chart_traces.py --courses 60
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aggregates import build_cube, rollup
+from extract_excel_data import KEY_COLUMN
+from generate_charts import build_dashboard_figure, grouped_bar_trace
+
+
+def make_cube(n_courses, n_years, n_students, seed=0):
+    """
+    Cube of a synthetic roster with many course variants (one per center and course)
+    """
+    rng = np.random.default_rng(seed)
+    years = [f'{2010 + i}-{2011 + i}' for i in range(n_years)]
+    courses = [f'Course {i:03d}' for i in range(n_courses)]
+    df = pd.DataFrame({
+        'YEAR': rng.choice(years, n_students),
+        'COURSE': rng.choice(courses, n_students),
+        'DURATION': rng.choice(['3 Months', '6 Months', '1 Year'], n_students),
+        'GENDER': rng.choice(['Female', 'Male', 'Unknown'], n_students),
+        'EMPLOYMENT_STATUS': rng.choice(['Employed', 'Not Employed'], n_students),
+        'PRESENT_STATUS': rng.choice(['Employed', 'Homemaker', 'Jobseeker', 'Other', 'Student'], n_students),
+        KEY_COLUMN: np.arange(n_students, dtype=np.int64),
+    })
+    return build_cube(df)
+
+
+def chart_inputs(cube):
+    import plotly.express as px
+
+    all_courses = sorted(cube['counts']['COURSE'].unique())
+    colors = px.colors.qualitative.Set3 * ((len(all_courses) // len(px.colors.qualitative.Set3)) + 1)
+    course_color_map = {course: colors[i] for i, course in enumerate(all_courses)}
+    year_order = sorted(cube['counts']['YEAR'].unique())
+    course_yearly_counts = rollup(cube, ['YEAR', 'COURSE'])
+    course_duration_counts = rollup(cube, ['COURSE', 'DURATION'])
+    course_duration_counts['COURSE_DURATION'] = course_duration_counts['COURSE'] + ' (' + course_duration_counts['DURATION'] + ')'
+    course_duration_counts = course_duration_counts.sort_values('count', ascending=False)
+    employed = rollup(cube, ['YEAR', 'COURSE'], where={'EMPLOYMENT_STATUS': 'Employed'}, name='Employed Students')
+    return all_courses, course_color_map, year_order, course_yearly_counts, course_duration_counts, employed
+
+
+def per_trace_figure(cube):
+    """
+    Charts 2, 3 and 7 as they were built before: one trace per course or course+duration
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    all_courses, course_color_map, year_order, course_yearly_counts, course_duration_counts, employed = chart_inputs(cube)
+    fig = make_subplots(rows=3, cols=1)
+    for course in all_courses:
+        course_data = course_yearly_counts[course_yearly_counts['COURSE'] == course].set_index('YEAR').reindex(year_order).reset_index()
+        fig.add_trace(go.Bar(x=course_data['YEAR'], y=course_data['count'].fillna(0), name=course,
+                             text=course_data['count'].fillna(0), textposition='auto',
+                             marker_color=course_color_map[course], legendgroup=course, showlegend=True,
+                             hovertemplate='<b>Year:</b> %{x}<br>' + f'<b>Course:</b> {course}<br>' +
+                                           '<b>Number of Students:</b> %{y}<br><extra></extra>'),
+                      row=1, col=1)
+    for _, row in course_duration_counts.iterrows():
+        fig.add_trace(go.Bar(x=[row['COURSE_DURATION']], y=[row['count']], text=[row['count']], textposition='auto',
+                             marker_color=course_color_map[row['COURSE']], name=row['COURSE_DURATION'],
+                             legendgroup=row['COURSE'], showlegend=True,
+                             hovertemplate='<b>Course:</b> %{x}<br><b>Number of Students:</b> %{y}<br><extra></extra>'),
+                      row=2, col=1)
+    for course in all_courses:
+        course_data = employed[employed['COURSE'] == course].set_index('YEAR').reindex(year_order).reset_index()
+        fig.add_trace(go.Bar(x=course_data['YEAR'], y=course_data['Employed Students'].fillna(0),
+                             name=f'Employed Students - {course}', marker_color=course_color_map[course],
+                             text=course_data['Employed Students'].fillna(0), textposition='auto',
+                             legendgroup=f'employment_{course}', showlegend=False,
+                             hovertemplate=f'<b>Year:</b> %{{x}}<br>Employed Students ({course}): %{{y}}<extra></extra>'),
+                      row=3, col=1)
+    fig.update_layout(barmode='group')
+    return fig
+
+
+def batched_figure(cube):
+    """
+    Charts 2, 3 and 7 as generate_charts builds them now: one trace each
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    all_courses, course_color_map, year_order, course_yearly_counts, course_duration_counts, employed = chart_inputs(cube)
+    fig = make_subplots(rows=3, cols=1)
+    fig.add_trace(grouped_bar_trace(course_yearly_counts, 'YEAR', year_order, 'COURSE', all_courses, course_color_map,
+                                    hovertemplate='<b>Year:</b> %{x}<br><b>Course:</b> %{customdata}<br>'
+                                                  '<b>Number of Students:</b> %{y}<br><extra></extra>'),
+                  row=1, col=1)
+    fig.add_trace(go.Bar(x=course_duration_counts['COURSE_DURATION'], y=course_duration_counts['count'],
+                         text=course_duration_counts['count'], textposition='auto',
+                         marker_color=course_duration_counts['COURSE'].map(course_color_map),
+                         customdata=course_duration_counts['COURSE'],
+                         hovertemplate='<b>Course:</b> %{x}<br><b>Number of Students:</b> %{y}<br><extra></extra>'),
+                  row=2, col=1)
+    fig.add_trace(grouped_bar_trace(employed, 'YEAR', year_order, 'COURSE', all_courses, course_color_map,
+                                    value_column='Employed Students',
+                                    hovertemplate='<b>Year:</b> %{x}<br>Employed Students (%{customdata}): %{y}<extra></extra>'),
+                  row=3, col=1)
+    fig.update_layout(barmode='group')
+    return fig
+
+
+def measure(build, cube, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = build(cube)
+        timings.append(time.perf_counter() - start)
+    html = fig.to_html(include_plotlyjs=False, full_html=False)
+    return min(timings), len(fig.data), len(html.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', type=int, default=60, help='Number of course variants')
+    parser.add_argument('--years', type=int, default=6, help='Number of academic years')
+    parser.add_argument('--students', type=int, default=50000, help='Number of synthetic students')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant, best time is reported')
+    args = parser.parse_args()
+
+    cube = make_cube(args.courses, args.years, args.students)
+    print(f"{args.courses} courses x {args.years} years, {len(cube['counts'])} cube cells")
+
+    variants = [('one trace per course', per_trace_figure),
+                ('batched traces', batched_figure),
+                ('full dashboard (batched)', build_dashboard_figure)]
+    for name, build in variants:
+        elapsed, traces, size = measure(build, cube, args.repeat)
+        print(f"{name:<26} {elapsed:8.3f} s   {traces:5d} traces   {size / 1e3:9.1f} kB HTML")
+
+
+if __name__ == "__main__":
+    main()
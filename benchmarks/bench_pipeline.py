@@ -0,0 +1,269 @@
+"""
+Time every stage of the extraction and chart pipeline on synthetic workbooks.
+
+Workbooks are generated in the same messy format as the real ones: header
+spellings from standardize_columns, batch-style sheet names, a NIIT workbook
+without COURSE/DURATION columns and free-text CURRENT STATUS and MONTHLY INCOME
+values. Generated workbooks are kept in --data-dir and reused by later runs.
+Results are written as JSON; pass --compare to print the change against an
+earlier run.
+
+Usage:
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 1000000 --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import extract_excel_data as extract
+from aggregates import build_cube
+from dashboard_writer import write_dashboard
+from generate_charts import build_dashboard_figure, check_combination_uniqueness
+from workbook_reader import excel_engine, read_workbook_sheets
+
+# Header spellings seen in the workbooks, per column; each sheet picks one at random
+HEADER_VARIANTS = {
+    'S_NO': ['S NO', 'S No', ' S NO '],
+    'ADM_NO': ['ADM NO', 'ADM \nNO', 'ADMISSION NO'],
+    'STUDENT': ['STUDENT', 'STUDENT '],
+    'FATHER_HUSBAND': ['FATHER/HUSBAND', 'FATHER\nHUSBAND', 'Father/                                  Husband'],
+    'COURSE': ['COURSE'],
+    'DURATION': ['DURATION', ' DURATION'],
+    'ADDRESS': ['ADDRESS'],
+    'MOBILE': ['MOBILE', 'MOB'],
+    'EMAIL': ['E-MAIL', 'E - MAIL'],
+    'EDUCATION': ['EDUCATION', 'QUALIFICATION'],
+    'CURRENT_STATUS': ['CURRENT STATUS', 'CURRENT\n STATUS'],
+    'MONTHLY_INCOME': ['MONTHLY INCOME', 'MONTHLY INCOME (RS.)', 'MONTHLY INCOME (IN RS)', 'MONTHLY \nINCOME (RS.)'],
+}
+
+SHEET_NAME_STYLES = ['Batch {0}-{1:02d}', 'Batch ({0}-{1:02d})', 'Batch {0} - {1:02d}', 'BATCH {0}-{1:02d} ({2})']
+
+FIRST_NAMES = ['Ram', 'Sita', 'Geeta', 'Mohan', 'Priya', 'Aarti', 'Sunil', 'Pooja', 'Rahul', 'Neha', 'Suman', 'Vikas']
+LAST_NAMES = ['Kumar', 'Devi', 'Singh', 'Sharma', 'Verma', 'Gupta', 'Yadav', 'Khan']
+RELATIONS = ['S/O', 'D/O', 'W/O', 'H/O', 'Son of', 'Daughter of', 'Wife of', 'C/O', '']
+COURSES = ['BASIC SKILLS', 'Basic Skill', '        Basic Skill', 'BASIC + TALLY', 'BASIC +Tally', 'Tally',
+           'TALLY', 'DTP', 'ADCA', 'Excel', None]
+DURATIONS = ['3 months', '3 Month', '3 MONTHS', '6 Months', ' 6 month ', '1 year', '12 months', None]
+STATUSES = ['Student', 'pursuing B.Com', 'Home Maker', 'homemaker', 'House wife', 'Seeking job', 'jobless',
+            'Working at shop', 'NIOS 12th', 'du sol', 'Teacher', 'Tailor', 'NA', '', None]
+INCOMES = ['8000', 'Rs. 12,000/-', 'NIL', 'nil', None, 0, 15000, '10k', '5000-7000', '', 'N/A', 'Rs 9500', 0.0, '0']
+EDUCATION = ['10th', '12th', 'B.A.', 'B.Com (P)', 'Graduate', '8th', None]
+
+
+def make_sheet(n_rows, rng, niit=False):
+    """
+    One roster sheet with randomly chosen header spellings
+    """
+    def pick(values):
+        return np.asarray(values, dtype=object)[rng.integers(0, len(values), n_rows)]
+
+    adm = rng.integers(1000, 1000 + 10 * n_rows, n_rows)
+    columns = {
+        'S_NO': np.arange(1, n_rows + 1),
+        # Admission numbers are a mix of numbers, prefixed strings and blanks
+        'ADM_NO': np.where(rng.random(n_rows) < 0.5, adm.astype(object), np.char.add('A', adm.astype(str)).astype(object)),
+        'STUDENT': np.char.add(np.char.add(pick(FIRST_NAMES).astype(str), ' '), pick(LAST_NAMES).astype(str)),
+        'FATHER_HUSBAND': np.char.add(np.char.add(pick(RELATIONS).astype(str), ' '), pick(FIRST_NAMES).astype(str)),
+        'COURSE': pick(COURSES),
+        'DURATION': pick(DURATIONS),
+        'ADDRESS': np.char.add('House ', rng.integers(1, 999, n_rows).astype(str)),
+        'MOBILE': rng.integers(7000000000, 9999999999, n_rows),
+        'EMAIL': pick(['student{}@example.com'.format(i) for i in range(50)] + ['bad', None]),
+        'EDUCATION': pick(EDUCATION),
+        'CURRENT_STATUS': pick(STATUSES),
+        'MONTHLY_INCOME': pick(INCOMES),
+    }
+    columns['ADM_NO'][rng.random(n_rows) < 0.05] = None
+    if niit:
+        del columns['COURSE'], columns['DURATION']
+    headers = {name: HEADER_VARIANTS[name][rng.integers(len(HEADER_VARIANTS[name]))] for name in columns}
+    return pd.DataFrame({headers[name]: values for name, values in columns.items()})
+
+
+def generate_workbooks(n_rows, data_dir, rows_per_sheet=50000, seed=0):
+    """
+    Write a batch workbook and a NIIT workbook with n_rows rows in total and
+    return their paths. Existing workbooks of the same size and seed are reused.
+    """
+    target = os.path.join(data_dir, f'{n_rows}_rows_seed{seed}')
+    paths = [os.path.join(target, 'Batch 2010 to 2030.xlsx'), os.path.join(target, 'NIIT centres.xlsx')]
+    if all(os.path.exists(path) for path in paths):
+        return paths
+
+    os.makedirs(target, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    engine = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') else 'openpyxl'
+    # Four fifths of the rows go to the batch workbook, the rest to NIIT
+    for path, rows, niit in [(paths[0], n_rows - n_rows // 5, False), (paths[1], n_rows // 5, True)]:
+        n_sheets = max(4, math.ceil(rows / rows_per_sheet))
+        sizes = [rows // n_sheets + (i < rows % n_sheets) for i in range(n_sheets)]
+        tmp_path = path.replace('.xlsx', '.tmp.xlsx')
+        with pd.ExcelWriter(tmp_path, engine=engine) as writer:
+            for i, size in enumerate(sizes):
+                year = 2010 + i % 20
+                style = 'NIIT {0}-{1:02d} ({2})' if niit else SHEET_NAME_STYLES[i % len(SHEET_NAME_STYLES)]
+                sheet_name = style.format(year, (year + 1) % 100, i)[:31]
+                make_sheet(size, rng, niit=niit).to_excel(writer, sheet_name=sheet_name, index=False)
+        os.replace(tmp_path, path)
+    return paths
+
+
+class StageTimer:
+    """
+    Accumulates wall time per stage name, in first-seen order
+    """
+    def __init__(self):
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def run_pipeline(paths, output_dir):
+    """
+    Run the pipeline stage by stage, in the order of extract_excel_data.process_sheet
+    """
+    timer = StageTimer()
+    sheet_data = {}
+    for path in paths:
+        with timer.stage('read_excel'):
+            sheets = list(read_workbook_sheets(path))
+        for sheet, df in sheets:
+            with timer.stage('standardize_columns'):
+                df = extract.standardize_columns(df, sheet, path)
+            with timer.stage('add_year'):
+                df = extract.add_year(df, sheet)
+            with timer.stage('clean_course_names'):
+                df = extract.clean_course_names(df)
+            with timer.stage('clean_duration'):
+                df = extract.clean_duration(df)
+            with timer.stage('create_unique_identifier'):
+                df = extract.create_unique_identifier(df)
+            with timer.stage('reorder_columns'):
+                df = extract.reorder_columns(df)
+            with timer.stage('extract_gender'):
+                df = extract.extract_gender(df)
+            with timer.stage('add_income'):
+                df = extract.add_income(df)
+            with timer.stage('add_employment_status'):
+                df = extract.add_employment_status(df)
+            with timer.stage('add_present_status'):
+                df = extract.add_present_status(df)
+            sheet_data[f'{os.path.basename(path)}_{sheet}'] = df
+
+    with timer.stage('combine_sheets'):
+        combined_df = extract.combine_sheets(sheet_data).dropna(subset=['YEAR'])
+    with timer.stage('uniqueness_check'), contextlib.redirect_stdout(io.StringIO()):
+        check_combination_uniqueness(combined_df)
+    with timer.stage('aggregation_cube'):
+        cube = build_cube(combined_df)
+    with timer.stage('build_figure'):
+        fig = build_dashboard_figure(cube)
+    with timer.stage('write_html'):
+        write_dashboard(fig, os.path.join(output_dir, 'dashboard.html'))
+
+    rows = sum(len(df) for df in sheet_data.values())
+    return rows, len(sheet_data), timer.timings
+
+
+def environment():
+    """
+    Versions and revision the timings were taken with
+    """
+    import plotly
+
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+        'excel_engine': excel_engine(),
+        'machine': platform.machine(),
+    }
+
+
+def print_comparison(results, baseline):
+    """
+    Per-stage ratio of this run against an earlier results file (< 1 is faster)
+    """
+    previous = {run['rows']: run['stages'] for run in baseline['runs']}
+    for run in results['runs']:
+        if run['rows'] not in previous:
+            continue
+        print(f"\n{run['rows']} rows vs {baseline['environment'].get('git_revision')}:")
+        for stage, seconds in run['stages'].items():
+            before = previous[run['rows']].get(stage)
+            if before:
+                print(f"  {stage:<26} {before:9.3f} s -> {seconds:9.3f} s   x{seconds / before:5.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Total rows per run (e.g. 1000 10000 100000 1000000)')
+    parser.add_argument('--rows-per-sheet', type=int, default=50000, help='Maximum rows per generated sheet')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per size, the best time of each stage is kept')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'student_pipeline_bench'),
+                        help='Where generated workbooks are kept between runs')
+    parser.add_argument('--output', default='bench_pipeline.json', help='JSON results file')
+    parser.add_argument('--compare', metavar='JSON', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    results = {'environment': environment(), 'runs': []}
+    for size in args.sizes:
+        start = time.perf_counter()
+        paths = generate_workbooks(size, args.data_dir, rows_per_sheet=args.rows_per_sheet, seed=args.seed)
+        print(f"\n{size} rows: workbooks ready in {time.perf_counter() - start:.1f} s")
+
+        best = {}
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as output_dir:
+                rows, n_sheets, timings = run_pipeline(paths, output_dir)
+            for stage, seconds in timings.items():
+                best[stage] = min(seconds, best.get(stage, seconds))
+
+        for stage, seconds in best.items():
+            print(f"  {stage:<26} {seconds:9.3f} s")
+        print(f"  {'total':<26} {sum(best.values()):9.3f} s")
+        results['runs'].append({'rows': rows, 'sheets': n_sheets, 'stages': best, 'total': sum(best.values())})
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to '{args.output}'")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
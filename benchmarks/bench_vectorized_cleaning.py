@@ -0,0 +1,72 @@
+"""
+Time the vectorized cleaning functions against the original row-wise versions.
+Their results are compared in tests/test_cleaning.py.
+
+Usage:
+    python benchmarks/bench_vectorized_cleaning.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'tests'))
+import legacy_cleaning
+from extract_excel_data import PRESENT_STATUS_KEYWORDS, add_employment_status, add_present_status, extract_gender
+
+
+def make_frame(n_rows, seed=0):
+    """
+    Roster-like columns with the messy values seen in the workbooks
+    """
+    rng = random.Random(seed)
+    relations = ['S/O', 'D/O', 'W/O', 'H/O', 'Son of', 'Wife of', 'C/O', '', 'Daughter of']
+    names = ['Ram', 'Shyam', 'Sonu', 'Hari', 'Mohan', 'Husband Lal']
+    incomes = ['8000', 'Rs. 12,000/-', 'NIL', None, 0, 15000, 0.0, '', ' ', '10k', 'N/A', '0', 7500.0]
+    status_words = [w for words in PRESENT_STATUS_KEYWORDS.values() for w in words] + ['Working', 'Tailor', 'NA']
+    # Realistic cardinality: many rows share the same few thousand values
+    fathers = [f"{rng.choice(relations)} {rng.choice(names)}".strip() for _ in range(5000)] + [np.nan, 12]
+    statuses = [' '.join(rng.sample(status_words, rng.randint(0, 2))).title() for _ in range(2000)] + [np.nan]
+    return pd.DataFrame({
+        'FATHER_HUSBAND': [rng.choice(fathers) for _ in range(n_rows)],
+        'MONTHLY_INCOME': [rng.choice(incomes) for _ in range(n_rows)],
+        'CURRENT_STATUS': [rng.choice(statuses) for _ in range(n_rows)],
+    })
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df.copy())
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000, help='Number of rows to generate')
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    # Each stage sees the columns produced by the stages before it, as in the pipeline
+    df = legacy_cleaning.add_employment_status(df)
+    stages = [
+        ('extract_gender', legacy_cleaning.extract_gender, extract_gender),
+        ('add_employment_status', legacy_cleaning.add_employment_status, add_employment_status),
+        ('add_present_status', legacy_cleaning.add_present_status, add_present_status),
+    ]
+
+    print(f"{args.rows} rows")
+    for name, legacy, vectorized in stages:
+        _, legacy_time = timed(legacy, df)
+        _, new_time = timed(vectorized, df)
+        print(f"{name:<24} row-wise {legacy_time:7.3f} s   vectorized {new_time:7.3f} s   "
+              f"{legacy_time / new_time:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
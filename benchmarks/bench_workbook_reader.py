@@ -0,0 +1,87 @@
+"""
+Benchmark the single-pass workbook reader against the old per-sheet read_excel loop.
+
+Usage:
+    python benchmarks/bench_workbook_reader.py --sheets 40 --rows 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from workbook_reader import HAS_CALAMINE, read_workbook_sheets
+
+
+def write_workbook(path, n_sheets, n_rows):
+    """
+    Write a workbook with many batch-style sheets of roster-like rows
+    """
+    df = pd.DataFrame({
+        'S NO': range(1, n_rows + 1),
+        'ADM NO': [f'A{1000 + i}' for i in range(n_rows)],
+        'STUDENT': [f'Student {i}' for i in range(n_rows)],
+        'FATHER/HUSBAND': [f'S/O Father {i}' for i in range(n_rows)],
+        'COURSE': ['BASIC SKILLS', 'Tally', 'DTP', 'DIT'] * (n_rows // 4) + ['Tally'] * (n_rows % 4),
+        'DURATION': '3 months',
+        'ADDRESS': 'Some street, Delhi',
+        'MOBILE': [9800000000 + i for i in range(n_rows)],
+        'CURRENT STATUS': 'Student',
+        'MONTHLY INCOME': 0,
+    })
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for i in range(n_sheets):
+            start = 2000 + i
+            df.to_excel(writer, sheet_name=f'Batch {start}-{str(start + 1)[2:]}', index=False)
+
+
+def old_loop(path):
+    """
+    The original loader: list sheet names, then reopen the workbook for every sheet
+    """
+    xls = pd.ExcelFile(path)
+    return {sheet: pd.read_excel(path, sheet_name=sheet) for sheet in xls.sheet_names}
+
+
+def single_pass(path, engine):
+    return dict(read_workbook_sheets(path, engine=engine))
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sheets', type=int, default=40, help='Number of sheets in the workbook')
+    parser.add_argument('--rows', type=int, default=500, help='Rows per sheet')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant, best time is reported')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'many_sheets.xlsx')
+        write_workbook(path, args.sheets, args.rows)
+        print(f"Workbook: {args.sheets} sheets x {args.rows} rows ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+        variants = [('per-sheet read_excel loop', lambda: old_loop(path)),
+                    ('single pass (openpyxl)', lambda: single_pass(path, 'openpyxl'))]
+        if HAS_CALAMINE:
+            variants.append(('single pass (calamine)', lambda: single_pass(path, 'calamine')))
+
+        baseline = None
+        for name, func in variants:
+            elapsed = best_of(func, args.repeat)
+            baseline = baseline or elapsed
+            print(f"{name:<28} {elapsed:8.3f} s   {baseline / elapsed:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import gzip
+import os
+
+# How the plotly.js bundle is delivered:
+# - 'inline': embedded in every HTML file (self-contained, several MB each)
+# - 'shared': written once to assets/ next to the dashboards and referenced by
+#   a relative <script src>, so it works offline and is cached by the browser
+OUTPUT_MODES = ('inline', 'shared')
+
+ASSET_DIR = 'assets'
+
+
+def plotly_asset_name():
+    """
+    File name of the shared plotly.js bundle, versioned so an upgrade never
+    serves a stale bundle from the browser cache
+    """
+    import plotly
+
+    return f'plotly-{plotly.__version__}.min.js'
+
+
+def _write_atomic(path, data):
+    """
+    Write bytes to path through a temporary file so readers never see a partial file.
+    The temporary file is named after the process, so concurrent writers never share it.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_gzip(path, data):
+    """
+    Write a pre-compressed copy next to path for servers that serve .gz files directly.
+    mtime=0 keeps the output identical between runs with the same content.
+    """
+    _write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+
+
+def write_plotly_asset(output_dir, gzip_output=False):
+    """
+    Write the plotly.js bundle to output_dir/assets once and return its path
+    relative to output_dir
+    """
+    from plotly.offline import get_plotlyjs
+
+    relative_path = f'{ASSET_DIR}/{plotly_asset_name()}'
+    asset_path = os.path.join(output_dir, ASSET_DIR, plotly_asset_name())
+    if not os.path.exists(asset_path):
+        os.makedirs(os.path.dirname(asset_path), exist_ok=True)
+        _write_atomic(asset_path, get_plotlyjs().encode('utf-8'))
+    if gzip_output and not os.path.exists(asset_path + '.gz'):
+        with open(asset_path, 'rb') as f:
+            _write_gzip(asset_path, f.read())
+    return relative_path
+
+
+def minify_figure(fig):
+    """
+    Return the figure as a dict without template styling for trace types the
+    figure does not use. The template otherwise carries defaults for every
+    plotly trace type (contour, surface, scattergeo, ...).
+    """
+    fig_dict = fig.to_dict()
+    used_types = {trace.get('type', 'scatter') for trace in fig_dict.get('data', [])}
+    template = fig_dict.get('layout', {}).get('template')
+    if template and 'data' in template:
+        template['data'] = {name: traces for name, traces in template['data'].items() if name in used_types}
+    return fig_dict
+
+
+def write_dashboard(fig, path, mode='inline', gzip_output=False):
+    """
+    Write a figure as a standalone HTML dashboard and return the written paths.
+
+    In 'shared' mode, plotly.js is written once to an assets/ directory next to
+    the HTML and the figure JSON is minified. With gzip_output, a .gz copy of
+    every written file is added for serving.
+    """
+    import plotly.io as pio
+
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r}, expected one of {OUTPUT_MODES}")
+
+    output_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(output_dir, exist_ok=True)
+    written = [path]
+    if mode == 'shared':
+        include_plotlyjs = write_plotly_asset(output_dir, gzip_output=gzip_output)
+        written.append(os.path.join(output_dir, include_plotlyjs))
+        fig = minify_figure(fig)
+    else:
+        include_plotlyjs = True
+
+    html = pio.to_html(fig, include_plotlyjs=include_plotlyjs, full_html=True, validate=mode == 'inline')
+    data = html.encode('utf-8')
+    _write_atomic(path, data)
+    if gzip_output:
+        _write_gzip(path, data)
+        written = written + [p + '.gz' for p in written]
+    return written
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+import re
+
+import pandas as pd
+
+from aggregates import slice_cube
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+DRILLDOWN_DIR = 'dashboards'
+MANIFEST_FILE = 'slices.json'
+
+# Dimensions that get one dashboard per value, and the file name prefix of each
+SLICE_DIMENSIONS = {'YEAR': 'year', 'COURSE': 'course'}
+
+# Bump whenever build_dashboard_figure changes its output, so every slice is rebuilt
+DRILLDOWN_VERSION = 2
+
+
+def _slug(value):
+    return re.sub(r'[^a-z0-9]+', '-', str(value).lower()).strip('-') or 'unknown'
+
+
+def slice_file_name(column, value, hashed=False):
+    """
+    File name of a slice dashboard, e.g. 'course-basic-tally.html'. With
+    hashed, the slug is followed by a short hash of the value, e.g.
+    'course-tally-1c5e0a2f.html', for values sharing a slug with another one.
+    """
+    slug = _slug(value)
+    if hashed:
+        slug += '-' + hashlib.sha256(str(value).encode('utf-8')).hexdigest()[:8]
+    return f'{SLICE_DIMENSIONS[column]}-{slug}.html'
+
+
+def slice_file_names(column, values):
+    """
+    Dict of value -> file name for the values of one dimension. Values that
+    differ only in case or punctuation (e.g. 'TALLY' and 'Tally') would share
+    a slug, so each of them gets a hash of its value appended instead.
+    """
+    slugs = pd.Series([_slug(value) for value in values], dtype=object)
+    shared = set(slugs[slugs.duplicated(keep=False)])
+    return {value: slice_file_name(column, value, hashed=slug in shared) for value, slug in zip(values, slugs)}
+
+
+def manifest_key(column, value):
+    """
+    Key of a slice in the manifest: its dimension and raw value, e.g. 'COURSE=Tally'
+    """
+    return f'{column}={value}'
+
+
+def _fingerprint(*tables, settings):
+    """
+    Content hash of the tables a slice dashboard is built from and its render settings
+    """
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    for table in tables:
+        if table is None:
+            digest.update(b'none')
+            continue
+        digest.update(json.dumps([str(column) for column in table.columns]).encode('utf-8'))
+        if len(table):
+            digest.update(pd.util.hash_pandas_object(table.astype(object), index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def people_by_slice(df):
+    """
+    Unique people per YEAR within every value of each slice dimension, from a
+    frame with a PERSON_ID column (see entity_resolution.resolve_people)
+    """
+    from entity_resolution import count_people
+
+    return {column: count_people(df, by=list(dict.fromkeys([column, 'YEAR']))) for column in SLICE_DIMENSIONS}
+
+
+def plan_slices(cube, people_by=None, title=None):
+    """
+    One entry per YEAR and per COURSE value in the cube: its manifest key, file
+    name, title, the sliced cube and the unique people per year of that slice.
+
+    people_by is the result of people_by_slice, or None when entity resolution is off.
+    """
+    from generate_charts import DASHBOARD_TITLE
+
+    title = title or DASHBOARD_TITLE
+    slices = []
+    for column in SLICE_DIMENSIONS:
+        values = sorted(cube['counts'][column].dropna().unique())
+        files = slice_file_names(column, values)
+        for value in values:
+            people = None
+            if people_by is not None:
+                counts = people_by[column]
+                people = counts.loc[counts[column] == value, ['YEAR', 'count']].reset_index(drop=True)
+            slices.append({
+                'key': manifest_key(column, value),
+                'file': files[value],
+                'title': f'{title}: {column.title()} {value}',
+                'cube': slice_cube(cube, {column: value}),
+                'people': people,
+            })
+    return slices
+
+
+def _render_slice(cube, people, title, path, output_mode, gzip_output):
+    """
+    Build and write one slice dashboard; runs in a worker process
+    """
+    from dashboard_writer import write_dashboard
+    from generate_charts import build_dashboard_figure
+
+    fig = build_dashboard_figure(cube, people=people, title=title)
+    return write_dashboard(fig, path, mode=output_mode, gzip_output=gzip_output)
+
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest, output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def write_drilldown_dashboards(cube, output_dir=DRILLDOWN_DIR, people_by=None, workers=1, output_mode='inline',
+                               gzip_output=False):
+    """
+    Write a dashboard per academic year and per course to output_dir, rendering
+    them in `workers` processes.
+
+    Every slice is fingerprinted from its part of the cube, its people counts and
+    the render settings (kept in output_dir/slices.json by dimension and raw
+    value, with the file it was written to). A slice is only rendered
+    again when its fingerprint changed or its file is missing, so a new sheet
+    for one course rebuilds that course and the years it covers, not every slice.
+    Dashboards of slices that no longer exist are removed.
+
+    Returns the list of rendered file names.
+    """
+    import plotly
+
+    from dashboard_writer import write_plotly_asset
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+    settings = {'version': DRILLDOWN_VERSION, 'plotly': plotly.__version__, 'mode': output_mode,
+                'gzip': gzip_output}
+
+    slices = plan_slices(cube, people_by)
+    entries = {}
+    pending = []
+    for item in slices:
+        tables = [item['cube'][name] for name in sorted(item['cube'])]
+        fingerprint = _fingerprint(*tables, item['people'], settings=dict(settings, title=item['title']))
+        entries[item['key']] = {'file': item['file'], 'fingerprint': fingerprint}
+        path = os.path.join(output_dir, item['file'])
+        if manifest.get(item['key']) != entries[item['key']] or not os.path.exists(path):
+            pending.append(item)
+
+    if pending and output_mode == 'shared':
+        # Written once here so the workers never race to create the shared bundle
+        write_plotly_asset(output_dir, gzip_output=gzip_output)
+
+    with stage('render_drilldown', source=output_dir, rows_in=len(pending)):
+        jobs = [(item['cube'], item['people'], item['title'], os.path.join(output_dir, item['file']),
+                 output_mode, gzip_output) for item in pending]
+        if workers > 1 and len(jobs) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+                for future in [executor.submit(_render_slice, *job) for job in jobs]:
+                    future.result()
+        else:
+            for job in jobs:
+                _render_slice(*job)
+
+    # Remove dashboards of years or courses that are gone. Manifests of older
+    # versions map file names to fingerprints.
+    previous = {entry['file'] if isinstance(entry, dict) else key for key, entry in manifest.items()}
+    for file in previous - {entry['file'] for entry in entries.values()}:
+        for path in (os.path.join(output_dir, file), os.path.join(output_dir, file + '.gz')):
+            if os.path.exists(path):
+                os.remove(path)
+    _save_manifest(entries, output_dir)
+
+    logger.info("Drill-down dashboards: %d of %d rendered, %d unchanged, in '%s'",
+                len(pending), len(slices), len(slices) - len(pending), output_dir)
+    for item in pending:
+        logger.debug("  rendered: %s", item['file'])
+    return [item['file'] for item in pending]
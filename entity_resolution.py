@@ -0,0 +1,239 @@
+import logging
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+PERSON_COLUMN = 'PERSON_ID'
+
+# Columns resolve_people compares, the ones a column projection must keep for it
+MATCH_COLUMNS = ['STUDENT', 'FATHER_HUSBAND', 'MOBILE', 'EMAIL']
+
+# Relation prefixes and honorifics removed before names are compared
+NAME_NOISE = re.compile(r'\b(s/o|d/o|w/o|h/o|c/o|son of|daughter of|wife of|husband of|care of|'
+                        r'mr|mrs|ms|miss|smt|shri|sh|sri|kumari|km|late)\b\.?')
+
+# Blocks larger than this (e.g. a centre's phone number entered for many students)
+# are not compared pairwise; identical profiles in them are still merged
+MAX_BLOCK_SIZE = 50
+
+# Two records are the same person when their student names are at least this
+# similar and the father/husband name, mobile or email agrees as well
+NAME_THRESHOLD = 0.85
+MATCH_THRESHOLD = 0.9
+
+
+def _normalize_unique(series, normalize):
+    """
+    Apply a string normalization to each distinct value once and broadcast it back
+    """
+    codes, uniques = pd.factorize(series.to_numpy())
+    normalized = normalize(pd.Series(uniques, dtype=object).astype(str))
+    values = np.asarray(normalized.where(normalized != '', None), dtype=object)
+    result = np.full(len(series), None, dtype=object)
+    present = codes >= 0
+    result[present] = values[codes[present]]
+    return pd.Series(result, index=series.index, dtype=object)
+
+
+def normalize_name(series):
+    """
+    Lower-case letters only, without relation prefixes (S/O, W/O ...) or honorifics
+    """
+    def normalize(values):
+        values = values.str.lower().str.replace(NAME_NOISE, ' ', regex=True)
+        return values.str.replace(r'[^a-z]+', ' ', regex=True).str.strip()
+    return _normalize_unique(series, normalize)
+
+
+def normalize_mobile(series):
+    """
+    The 10-digit Indian mobile number in a value, without +91/0 prefixes or
+    separators; missing when the value is not a valid mobile number
+    """
+    def normalize(values):
+        digits = values.str.replace(r'\.0$', '', regex=True).str.replace(r'\D', '', regex=True)
+        digits = digits.str.replace(r'^(?:91|0)(?=\d{10}$)', '', regex=True)
+        return digits.where(digits.str.fullmatch(r'[6-9]\d{9}'), '')
+    return _normalize_unique(series, normalize)
+
+
+def normalize_email(series):
+    """
+    Lower-cased email address, missing when the value does not look like one
+    """
+    def normalize(values):
+        values = values.str.strip().str.lower()
+        return values.where(values.str.fullmatch(r'[^@\s]+@[^@\s]+\.[a-z]{2,}'), '')
+    return _normalize_unique(series, normalize)
+
+
+@lru_cache(maxsize=None)
+def soundex(word):
+    """
+    American Soundex code of a word, e.g. 'priya' and 'priyaa' -> 'P600'
+    """
+    codes = {**dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'), **dict.fromkeys('dt', '3'),
+             'l': '4', **dict.fromkeys('mn', '5'), 'r': '6'}
+    if not word:
+        return ''
+    result = word[0].upper()
+    previous = codes.get(word[0], '')
+    for char in word[1:]:
+        code = codes.get(char, '')
+        if code and code != previous:
+            result += code
+        if char not in 'hw':
+            previous = code
+    return (result + '000')[:4]
+
+
+def phonetic_key(name):
+    """
+    Soundex of every token of a normalized name, so spelling variants share a key
+    """
+    return ' '.join(soundex(token) for token in name.split()) if name else None
+
+
+def _similarity(a, b):
+    if a is None or b is None:
+        return 0.0
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def match_score(a, b):
+    """
+    Score how likely two profiles (student, father, mobile, email) are the same person
+    """
+    student_a, father_a, mobile_a, email_a = a
+    student_b, father_b, mobile_b, email_b = b
+    if mobile_a and mobile_b and mobile_a != mobile_b:
+        return 0.0
+    student = _similarity(student_a, student_b)
+    if student < NAME_THRESHOLD:
+        return 0.0
+    evidence = max(_similarity(father_a, father_b),
+                   1.0 if mobile_a and mobile_a == mobile_b else 0.0,
+                   1.0 if email_a and email_a == email_b else 0.0)
+    return (student + evidence) / 2
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _union(parent, mobiles, i, j):
+    """
+    Merge the clusters of i and j unless they hold different mobile numbers, which
+    would otherwise chain two people together through a record without one
+    """
+    root_i, root_j = _find(parent, i), _find(parent, j)
+    if root_i == root_j:
+        return
+    if mobiles[root_i] and mobiles[root_j] and mobiles[root_i].isdisjoint(mobiles[root_j]):
+        return
+    root, child = min(root_i, root_j), max(root_i, root_j)
+    parent[child] = root
+    mobiles[root] = mobiles[root] | mobiles[child]
+
+
+# Columns of normalize_profiles, in the order match_score takes them
+PROFILE_FIELDS = ['student', 'father', 'mobile', 'email']
+
+
+def normalize_profiles(df):
+    """
+    The normalized profile (student, father/husband, mobile, email) of every
+    record of df, with missing values where a column is absent or unusable
+    """
+    empty = pd.Series(None, index=df.index, dtype=object)
+    return pd.DataFrame({
+        'student': normalize_name(df['STUDENT']) if 'STUDENT' in df.columns else empty,
+        'father': normalize_name(df['FATHER_HUSBAND']) if 'FATHER_HUSBAND' in df.columns else empty,
+        'mobile': normalize_mobile(df['MOBILE']) if 'MOBILE' in df.columns else empty,
+        'email': normalize_email(df['EMAIL']) if 'EMAIL' in df.columns else empty,
+    }, index=df.index)
+
+
+def resolve_people(df, profiles=None):
+    """
+    Assign a PERSON_ID to every record so the same person is recognized across
+    courses, years and workbooks.
+
+    Identical normalized profiles (student, father/husband, mobile, email) are
+    merged first. The remaining profiles are grouped by blocking keys (normalized
+    mobile, phonetic student + father name key, email) and only profiles sharing
+    a block are scored against each other; matches are merged with union-find.
+    The ID of a person is the smallest profile hash among their records, so it
+    does not depend on row order.
+
+    profiles are the normalize_profiles of df when they were computed already.
+    Returns an int64 Series aligned with df.index.
+    """
+    with stage('resolve_people', rows_in=len(df)) as record:
+        profiles = normalize_profiles(df) if profiles is None else profiles[PROFILE_FIELDS]
+
+        # One entry per distinct profile; records are mapped back through profile_ids
+        profile_ids = profiles.groupby(list(profiles.columns), dropna=False, sort=False).ngroup().to_numpy()
+        unique = profiles[~pd.Series(profile_ids).duplicated().to_numpy()].reset_index(drop=True)
+        # Compare profiles in hash order, so the clusters do not depend on row or file order
+        hashes = pd.util.hash_pandas_object(unique.astype(str), index=False).to_numpy().view(np.int64)
+        order = np.argsort(hashes, kind='stable')
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+        profile_ids = position[profile_ids]
+        unique, hashes = unique.iloc[order].reset_index(drop=True), hashes[order]
+        rows = list(unique.itertuples(index=False, name=None))
+
+        parent = list(range(len(unique)))
+        mobiles = [frozenset([mobile]) if mobile else frozenset() for _, _, mobile, _ in rows]
+        name_keys = [f"{phonetic_key(student)}|{phonetic_key(father)}" if student else None
+                     for student, father, _, _ in rows]
+        blocks = {'mobile': unique['mobile'], 'name': pd.Series(name_keys, dtype=object), 'email': unique['email']}
+        compared = skipped = 0
+        for block_keys in blocks.values():
+            members = pd.Series(np.arange(len(unique))).groupby(block_keys.to_numpy(), dropna=True)
+            for _, group in members:
+                if len(group) < 2:
+                    continue
+                if len(group) > MAX_BLOCK_SIZE:
+                    skipped += 1
+                    continue
+                for i, j in combinations(group.to_numpy(), 2):
+                    compared += 1
+                    if _find(parent, i) != _find(parent, j) and match_score(rows[i], rows[j]) >= MATCH_THRESHOLD:
+                        _union(parent, mobiles, i, j)
+
+        # Stable ID per person: the smallest profile hash in the cluster
+        roots = np.array([_find(parent, i) for i in range(len(unique))], dtype=np.int64)
+        person_hash = pd.Series(hashes).groupby(roots).transform('min').to_numpy()
+        person_ids = pd.Series(person_hash[profile_ids], index=df.index, name=PERSON_COLUMN)
+
+        record['rows_out'] = len(person_ids)
+    n_people = len(np.unique(person_hash))
+    logger.info("Entity resolution: %d records, %d distinct profiles, %d people (%d pairs compared)",
+                len(df), len(unique), n_people, compared)
+    if skipped:
+        logger.debug("Entity resolution: %d blocks larger than %d were not compared", skipped, MAX_BLOCK_SIZE)
+    return person_ids
+
+
+def count_people(df, by=None):
+    """
+    Distinct PERSON_ID counts, overall (by=None) or per combination of the `by` columns
+    """
+    if by is None:
+        return df[PERSON_COLUMN].nunique()
+    return df.groupby(by, observed=True)[PERSON_COLUMN].nunique().reset_index(name='count')
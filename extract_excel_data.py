@@ -1,43 +1,65 @@
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import logging
+import os
+import numpy as np
 import pandas as pd
 import re
+from functools import lru_cache
+
+import instrumentation
+from instrumentation import run_stage, stage
+
+logger = logging.getLogger(__name__)
+
+# The Excel readers, the sheet cache and the process pool are imported inside the
+# functions that use them, so importing this module for its cleaning functions
+# does not load them and never touches the workbooks.
+
+# Raw header names, stripped of surrounding spaces, and their standardized names
+COLUMN_MAPPING = {
+    'S NO': 'S_NO',
+    'S No': 'S_NO',
+    'ADM \nNO': 'ADM_NO',
+    'ADM NO': 'ADM_NO',
+    'ADMISSION NO': 'ADM_NO',
+    'STUDENT': 'STUDENT',
+    'FATHER\nHUSBAND': 'FATHER_HUSBAND',
+    'Father/                                  Husband': 'FATHER_HUSBAND',
+    'FATHER/HUSBAND': 'FATHER_HUSBAND',
+    'COURSE': 'COURSE',
+    'DURATION': 'DURATION',
+    'ADDRESS': 'ADDRESS',
+    'MOB': 'MOBILE',
+    'MOBILE': 'MOBILE',
+    'E - MAIL': 'EMAIL',
+    'E-MAIL': 'EMAIL',
+    'EDUCATION': 'EDUCATION',
+    'QUALIFICATION': 'EDUCATION',
+    'CURRENT STATUS': 'CURRENT_STATUS',
+    'CURRENT\n STATUS': 'CURRENT_STATUS',
+    'MONTHLY INCOME': 'MONTHLY_INCOME',
+    'MONTHLY INCOME (RS.)': 'MONTHLY_INCOME',
+    'MONTHLY INCOME (IN RS)': 'MONTHLY_INCOME',
+    'MONTHLY \nINCOME (RS.)': 'MONTHLY_INCOME'
+}
+
+def standardize_column_name(name):
+    """
+    Standardized name of a raw header: its COLUMN_MAPPING entry, or the
+    stripped name with spaces replaced by underscores
+    """
+    name = str(name).strip()
+    return COLUMN_MAPPING.get(name, name).replace(' ', '_')
 
 def standardize_columns(df, sheet_name, file_name):
     """
     Standardize column names across all sheets
     """
-    # Create a mapping for column name standardization
-    column_mapping = {
-        'S NO': 'S_NO',
-        'S No': 'S_NO',
-        'ADM \nNO': 'ADM_NO',
-        'ADM NO': 'ADM_NO',
-        'ADMISSION NO': 'ADM_NO',
-        'STUDENT': 'STUDENT',
-        'FATHER\nHUSBAND': 'FATHER_HUSBAND',
-        'Father/                                  Husband': 'FATHER_HUSBAND',
-        'FATHER/HUSBAND': 'FATHER_HUSBAND',
-        'COURSE': 'COURSE',
-        'DURATION': 'DURATION',
-        'ADDRESS': 'ADDRESS',
-        'MOB': 'MOBILE',
-        'MOBILE': 'MOBILE',
-        'E - MAIL': 'EMAIL',
-        'E-MAIL': 'EMAIL',
-        'EDUCATION': 'EDUCATION',
-        'QUALIFICATION': 'EDUCATION',
-        'CURRENT STATUS': 'CURRENT_STATUS',
-        'CURRENT\n STATUS': 'CURRENT_STATUS',
-        'MONTHLY INCOME': 'MONTHLY_INCOME',
-        'MONTHLY INCOME (RS.)': 'MONTHLY_INCOME',
-        'MONTHLY INCOME (IN RS)': 'MONTHLY_INCOME',
-        'MONTHLY \nINCOME (RS.)': 'MONTHLY_INCOME'
-    }
-    
-    # Apply the mapping
-    df.columns = df.columns.map(lambda x: column_mapping.get(x.strip(), x.strip()))
-    
-    # Replace spaces with underscores in remaining column names
-    df.columns = df.columns.str.replace(' ', '_')
+    df.columns = df.columns.map(standardize_column_name)
     
     # Add COURSE column for NIIT sheets if it doesn't exist
     if 'COURSE' not in df.columns and 'NIIT' in file_name:
@@ -73,21 +95,65 @@ def extract_year_from_sheet(sheet_name):
     
     return None
 
-def create_unique_identifier(df):
+# Columns whose combination identifies one enrollment of a student
+ID_COLUMNS = ['ADM_NO', 'STUDENT', 'FATHER_HUSBAND', 'COURSE', 'DURATION', 'YEAR']
+
+# 64-bit integer key hashed from ID_COLUMNS, used for distinct counts and duplicate checks
+KEY_COLUMN = 'STUDENT_KEY'
+
+# Standardized columns the cleaning stages read; every column projection keeps them
+CLEANING_COLUMNS = ID_COLUMNS + ['CURRENT_STATUS', 'MONTHLY_INCOME']
+
+# Columns added by the cleaning stages (YEAR from the sheet name), never read from a sheet
+DERIVED_COLUMNS = ['YEAR', 'GENDER', 'INCOME', 'EMPLOYMENT_STATUS', 'PRESENT_STATUS', 'UNIQUE_ID', KEY_COLUMN]
+
+def read_columns(columns=None):
     """
-    Create a unique identifier from the combination of specified columns
+    Sorted standardized columns to read for a consumer using `columns`
+    (standardized or derived names): CLEANING_COLUMNS and the requested
+    columns, without DERIVED_COLUMNS. None stands for every column.
+    """
+    if columns is None:
+        return None
+    return sorted((set(CLEANING_COLUMNS) | set(columns)) - set(DERIVED_COLUMNS))
+
+def column_filter(columns):
+    """
+    usecols callable for the readers: True for the raw header names whose
+    standardized name is one of columns. None reads every column.
+    """
+    if columns is None:
+        return None
+    wanted = frozenset(columns)
+    return lambda name: standardize_column_name(name) in wanted
+
+def _string_values(series):
+    """
+    str() of every value, converting each distinct value only once
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return pd.Series(np.asarray([str(value) for value in uniques], dtype=object)[codes], index=series.index)
+
+def create_unique_identifier(df, readable_id=True):
+    """
+    Create a unique identifier from the combination of specified columns.
+
+    STUDENT_KEY is a 64-bit hash of the string form of ID_COLUMNS, so values that
+    render the same (e.g. ADM_NO 101 and '101') get the same key. The
+    human-readable UNIQUE_ID string is only added when readable_id is True.
     """
-    # Define the columns to combine
-    columns_to_combine = ['ADM_NO', 'STUDENT', 'FATHER_HUSBAND', 'COURSE', 'DURATION', 'YEAR']
-    
     # Check if all required columns exist
-    missing_columns = [col for col in columns_to_combine if col not in df.columns]
+    missing_columns = [col for col in ID_COLUMNS if col not in df.columns]
     if missing_columns:
-        print(f"Warning: Missing columns for unique identifier: {missing_columns}")
+        logger.warning("Missing columns for unique identifier: %s", missing_columns)
         return df
     
-    # Create unique identifier by combining all specified columns
-    df['UNIQUE_ID'] = df[columns_to_combine].astype(str).agg('_'.join, axis=1)
+    strings = pd.DataFrame({col: _string_values(df[col]) for col in ID_COLUMNS}, index=df.index)
+    df[KEY_COLUMN] = pd.util.hash_pandas_object(strings, index=False).values.view(np.int64)
+
+    if readable_id:
+        # Create unique identifier by combining all specified columns
+        df['UNIQUE_ID'] = strings[ID_COLUMNS[0]].str.cat([strings[col] for col in ID_COLUMNS[1:]], sep='_')
     
     return df
 
@@ -110,7 +176,8 @@ def reorder_columns(df):
         'CURRENT_STATUS',
         'MONTHLY_INCOME',
         'YEAR',
-        'UNIQUE_ID'
+        'UNIQUE_ID',
+        KEY_COLUMN
     ]
     
     # Get existing columns that are in the standard order
@@ -121,160 +188,626 @@ def reorder_columns(df):
     final_order = existing_columns + additional_columns
     
     # Reorder the dataframe
-    return df[final_order]
+    return df.reindex(columns=final_order)
+
+# Columns holding only a handful of distinct values, stored as pandas Categorical
+CATEGORICAL_COLUMNS = ['COURSE', 'DURATION', 'YEAR', 'GENDER', 'EMPLOYMENT_STATUS', 'PRESENT_STATUS']
+
+@lru_cache(maxsize=None)
+def _keyword_pattern(keywords):
+    """
+    Compile a tuple of keywords into one alternation regex matching any of them as a substring
+    """
+    # Longest first so the regex engine tries the most specific keyword first
+    ordered = sorted(set(k.lower() for k in keywords), key=len, reverse=True)
+    return re.compile('|'.join(re.escape(k) for k in ordered))
+
+def _classify_unique(series, classify, categories=None):
+    """
+    Run a vectorized classifier over the distinct values of a Series only and
+    broadcast the labels back to every row as a Categorical.
+    Categories default to the sorted labels produced.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    labels = pd.Index(np.asarray(classify(pd.Series(uniques, dtype=object)), dtype=object))
+    if categories is None:
+        categories = sorted(labels.dropna().unique())
+    label_codes = pd.Index(categories).get_indexer(labels)
+    return pd.Series(pd.Categorical.from_codes(label_codes[codes], categories=categories), index=series.index)
+
+def _map_table(mapping):
+    """
+    Classifier applying a lookup table to the stripped string form of each value,
+    keeping values missing from the table as they are
+    """
+    def classify(values):
+        values = values.map(str).str.strip()
+        return values.map(mapping).fillna(values)
+    return classify
+
+# Mapping for course name standardization
+COURSE_MAPPING = {
+    'BASIC SKILLS': 'Basic Skills',
+    'Basic Skills': 'Basic Skills',
+    'Basic Skill': 'Basic Skills',
+    '        Basic Skill': 'Basic Skills',
+    'BASIC SKIILS': 'Basic Skills',
+    'BASIC + TALLY': 'Basic + Tally',
+    'BASIC +Tally': 'Basic + Tally',
+    'Tally': 'Tally',
+    'DIT': 'ADCA',
+    'DTP': 'DTP',
+    'NIIT': 'NIIT'
+}
 
 def clean_course_names(df):
     """
     Clean and standardize course names to combine similar courses
     """
-    # Create a mapping for course name standardization
-    course_mapping = {
-        'BASIC SKILLS': 'Basic Skills',
-        'Basic Skills': 'Basic Skills',
-        'Basic Skill': 'Basic Skills',
-        '        Basic Skill': 'Basic Skills',
-        'BASIC SKIILS': 'Basic Skills',
-        'BASIC + TALLY': 'Basic + Tally',
-        'BASIC +Tally': 'Basic + Tally',
-        'Tally': 'Tally',
-        'DIT': 'ADCA',
-        'DTP': 'DTP',
-        'NIIT': 'NIIT'
-    }
-    
-    # Apply the mapping
-    df['COURSE'] = df['COURSE'].map(lambda x: course_mapping.get(str(x).strip(), str(x).strip()))
+    # Apply the mapping to each distinct course name once
+    df['COURSE'] = _classify_unique(df['COURSE'], _map_table(COURSE_MAPPING))
     
     return df
 
+# Mapping for duration standardization
+DURATION_MAPPING = {
+    '3 months': '3 Months',
+    '3 month': '3 Months',
+    '3 Months': '3 Months',
+    '3 Month': '3 Months',
+    '6 months': '6 Months',
+    '6 month': '6 Months',
+    '6 Months': '6 Months',
+    '6 Month': '6 Months',
+    '1 year': '1 Year',
+    '1 Year': '1 Year',
+    '12 months': '1 Year',
+    '12 Months': '1 Year',
+    '12 month': '1 Year',
+    '12 Month': '1 Year',
+}
+
 def clean_duration(df):
     """
     Standardize duration values.
     """
-    duration_mapping = {
-        '3 months': '3 Months',
-        '3 month': '3 Months',
-        '3 Months': '3 Months',
-        '3 Month': '3 Months',
-        '6 months': '6 Months',
-        '6 month': '6 Months',
-        '6 Months': '6 Months',
-        '6 Month': '6 Months',
-        '1 year': '1 Year',
-        '1 Year': '1 Year',
-        '12 months': '1 Year',
-        '12 Months': '1 Year',
-        '12 month': '1 Year',
-        '12 Month': '1 Year',
-    }
-    df['DURATION'] = df['DURATION'].map(lambda x: duration_mapping.get(str(x).strip(), str(x).strip()))
+    df['DURATION'] = _classify_unique(df['DURATION'], _map_table(DURATION_MAPPING))
     return df
 
+# Keywords looked up in the lowercased FATHER_HUSBAND relation, checked in this order
+GENDER_KEYWORDS = [
+    ('Female', ['w/o', 'wife of', 'wife']),
+    ('Male', ['s/o', 'son of', 'son']),
+    ('Female', ['d/o', 'daughter of', 'daughter']),
+    ('Male', ['h/o', 'husband of', 'husband']),
+]
+
 def extract_gender(df):
     """
     Extract gender from the FATHER_HUSBAND column and create a new GENDER column.
     """
-    def get_gender(value):
-        value = str(value).lower()
-        if 'w/o' in value or 'wife of' in value or 'wife' in value:
-            return 'Female'
-        elif 's/o' in value or 'son of' in value or 'son' in value:
-            return 'Male'
-        elif 'd/o' in value or 'daughter of' in value or 'daughter' in value:
-            return 'Female'
-        elif 'h/o' in value or 'husband of' in value or 'husband' in value:
-            return 'Male'
-        else:
-            return 'Unknown'
-    df['GENDER'] = df['FATHER_HUSBAND'].apply(get_gender)
+    def classify(values):
+        values = values.map(str).str.lower()
+        conditions = [values.str.contains(_keyword_pattern(tuple(words))) for _, words in GENDER_KEYWORDS]
+        return np.select(conditions, [gender for gender, _ in GENDER_KEYWORDS], default='Unknown')
+    df['GENDER'] = _classify_unique(df['FATHER_HUSBAND'], classify, categories=['Female', 'Male', 'Unknown'])
+    return df
+
+# Units written after an amount in MONTHLY_INCOME and their value in rupees
+INCOME_UNITS = {'k': 1000, 'thousand': 1000, 'lakh': 100000, 'lakhs': 100000, 'lac': 100000, 'lacs': 100000}
+
+# An amount in MONTHLY_INCOME: a number with an optional unit, optionally followed
+# by a second one after '-' or 'to', as in '5000-7000', '8 to 10k' or '1.5 lakh'
+_INCOME_UNIT = r'(?:k|thousand|lakhs?|lacs?)\b'
+INCOME_PATTERN = (rf'(?P<low>\d+(?:\.\d+)?)\s*(?P<low_unit>{_INCOME_UNIT})?'
+                  rf'(?:\s*(?:-|–|to)\s*(?P<high>\d+(?:\.\d+)?)\s*(?P<high_unit>{_INCOME_UNIT})?)?')
+
+# MONTHLY_INCOME entries without an amount that mean no income
+NO_INCOME_PATTERN = r'\b(?:nil|none|no income|not working|unemployed)\b'
+
+def parse_income(series):
+    """
+    Monthly income in rupees from the free text of MONTHLY_INCOME, as a nullable
+    Float64 Series: '8000' -> 8000, 'Rs. 12,000/-' -> 12000, '10k' -> 10000,
+    '1.5 lakh' -> 150000, '5000-7000' -> 6000 (ranges give their midpoint),
+    'NIL' -> 0, and <NA> for missing values and text without an amount. Only
+    the first amount counts, so 'abc 0 1' -> 0. Each distinct value is parsed
+    once, with vectorized string operations.
+    """
+    codes, uniques = pd.factorize(series.to_numpy())
+    text = pd.Series(uniques, dtype=object).astype(str).str.lower()
+    # Thousands separators and the '/-' after rupee amounts
+    text = text.str.replace(r'(?<=\d),(?=\d)', '', regex=True).str.replace('/-', '', regex=False)
+    parts = text.str.extract(INCOME_PATTERN)
+    low = pd.to_numeric(parts['low'])
+    high = pd.to_numeric(parts['high'])
+    low_unit = parts['low_unit'].map(INCOME_UNITS)
+    high_unit = parts['high_unit'].map(INCOME_UNITS).fillna(1)
+    # In '8-10k' the 'k' applies to both bounds
+    low_unit = low_unit.fillna(high_unit.where(low <= high, 1)).fillna(1)
+    low = low * low_unit
+    high = high * high_unit
+    amount = ((low + high) / 2).fillna(low)
+    amount = amount.mask(amount.isna() & text.str.contains(NO_INCOME_PATTERN), 0.0)
+
+    values = np.full(len(series), np.nan)
+    values[codes >= 0] = amount.to_numpy(dtype=float)[codes[codes >= 0]]
+    return pd.Series(pd.array(values, dtype='Float64'), index=series.index)
+
+def add_income(df):
+    """
+    Add INCOME: MONTHLY_INCOME parsed as rupees per month (see parse_income)
+    """
+    df['INCOME'] = parse_income(df['MONTHLY_INCOME'])
     return df
 
 def add_employment_status(df):
     """
-    Add a new column EMPLOYMENT_STATUS: 'Employed' if MONTHLY_INCOME contains any digit other than zero, else 'Not Employed'.
-    """
-    def get_status(val):
-        if pd.isnull(val) or str(val).strip() == '':
-            return 'Not Employed'
-        val_str = str(val)
-        # If there is any digit other than zero, it's employed
-        if re.search(r'[1-9]', val_str):
-            return 'Employed'
-        return 'Not Employed'
-    df['EMPLOYMENT_STATUS'] = df['MONTHLY_INCOME'].apply(get_status)
+    Add a new column EMPLOYMENT_STATUS: 'Employed' if the parsed INCOME is above zero, else 'Not Employed'.
+    INCOME is parsed from MONTHLY_INCOME here when add_income has not run.
+    """
+    income = df['INCOME'] if 'INCOME' in df.columns else parse_income(df['MONTHLY_INCOME'])
+    employed = income.fillna(0).gt(0).to_numpy(dtype=bool)
+    df['EMPLOYMENT_STATUS'] = pd.Categorical.from_codes(np.where(employed, 0, 1).astype(np.int8),
+                                                        categories=['Employed', 'Not Employed'])
+    return df
+
+# Keywords looked up in the lowercased CURRENT_STATUS, per present status.
+# Categories are checked in this order after 'Employed'; anything else is 'Other'.
+PRESENT_STATUS_KEYWORDS = {
+    'Student': ['student', 'pursuing', 'studying', 'school', 'college', 'class', 'std', 'b.a', 'b.com', 'b.sc', 'b.a.', 'b.com.', 'b.sc.', 'bachelor', 'llb', 'msc', 'maitreyi', 'ignou', 'du', 'nios', 'univ', 'university'],
+    'Homemaker': ['home maker', 'homemaker', 'home-maker', 'homermaker'],
+    'Jobseeker': ['seeking job', 'seeking jobs', 'jobseeker', 'job seeker', 'seeking', 'looking for job', 'looking for work', 'seeking employment', 'seeking jobs in', 'seeking jobs as', 'seeking jobs at', 'jobless', 'unemployed'],
+}
+
+def add_present_status(df, keywords=None):
+    """
+    Add PRESENT_STATUS: 'Employed' if EMPLOYMENT_STATUS is employed, otherwise the first
+    category of `keywords` (default PRESENT_STATUS_KEYWORDS) whose keywords appear in
+    CURRENT_STATUS, else 'Other'.
+    """
+    keywords = PRESENT_STATUS_KEYWORDS if keywords is None else keywords
+
+    def classify(statuses):
+        statuses = statuses.map(str).str.lower()
+        conditions = [statuses.str.contains(_keyword_pattern(tuple(words))) for words in keywords.values()]
+        return np.select(conditions, list(keywords), default='Other')
+
+    if 'CURRENT_STATUS' in df.columns:
+        current_status = df['CURRENT_STATUS']
+    else:
+        current_status = pd.Series('', index=df.index)
+    categories = sorted(set(keywords) | {'Employed', 'Other'})
+    status = _classify_unique(current_status, classify, categories=categories)
+    df['PRESENT_STATUS'] = status.where(df['EMPLOYMENT_STATUS'] != 'Employed', 'Employed')
+    return df
+
+def add_year(df, sheet):
+    """
+    Add the academic YEAR taken from the sheet name as a single-category column
+    """
+    year = extract_year_from_sheet(sheet)
+    if year:
+        df['YEAR'] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[year])
+    return df
+
+def process_sheet(df, sheet, file, readable_id=True):
+    """
+    Run all cleaning stages on the raw DataFrame of one sheet. Each stage is
+    recorded by the instrumentation module when profiling is enabled.
+    """
+    source = f"{file}:{sheet}"
+
+    # Standardize column names
+    df = run_stage(standardize_columns, df, sheet, file, source=source)
+    
+    # Extract year from sheet name
+    df = run_stage(add_year, df, sheet, source=source)
+
+    # Clean course names
+    df = run_stage(clean_course_names, df, source=source)
+    
+    # Clean duration
+    df = run_stage(clean_duration, df, source=source)
+    
+    # Create unique identifier
+    df = run_stage(create_unique_identifier, df, readable_id=readable_id, source=source)
+    
+    # Reorder columns to ensure consistent order
+    df = run_stage(reorder_columns, df, source=source)
+    
+    # Extract gender
+    df = run_stage(extract_gender, df, source=source)
+    
+    # Parse the monthly income
+    df = run_stage(add_income, df, source=source)
+
+    # Add employment status
+    df = run_stage(add_employment_status, df, source=source)
+    
+    # Add present status
+    df = run_stage(add_present_status, df, source=source)
+
     return df
 
-# Read the Excel files
+def cache_settings(readable_id=True, columns=None):
+    """
+    Digest of the configurable tables and options used by the cleaning stages,
+    so cached sheets are re-cleaned after they change
+    """
+    settings = json.dumps({
+        'readable_id': readable_id,
+        'columns': columns,
+        'course_mapping': COURSE_MAPPING,
+        'duration_mapping': DURATION_MAPPING,
+        'gender_keywords': GENDER_KEYWORDS,
+        'present_status_keywords': PRESENT_STATUS_KEYWORDS,
+        'income_pattern': INCOME_PATTERN,
+        'income_units': INCOME_UNITS,
+    }, sort_keys=True)
+    return hashlib.sha256(settings.encode('utf-8')).hexdigest()
+
+def cache_directory(columns=None):
+    """
+    Sheet cache directory for the columns read (see read_columns): the main cache
+    for every column and a subdirectory per projection, so runs reading
+    different columns do not evict each other's sheets
+    """
+    from sheet_cache import CACHE_DIR
+
+    if columns is None:
+        return CACHE_DIR
+    digest = hashlib.sha256(json.dumps(columns).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f'columns-{digest}')
+
+def process_sheet_group(file, sheets, readable_id=True, known_raw=None, columns=None):
+    """
+    Read a group of sheets through one workbook handle and clean each of them.
+    Runs in a worker process when sheets are processed in parallel. With
+    columns, only the raw columns standardizing to one of them are read.
+
+    Returns (sheet, raw fingerprint, cleaned DataFrame) per sheet. The DataFrame is
+    None when the raw fingerprint equals known_raw[sheet], i.e. the sheet did not
+    change and its cleaned version can be taken from the cache.
+    """
+    from sheet_cache import frame_fingerprint
+    from workbook_reader import read_workbook_sheets
+
+    known_raw = known_raw or {}
+    results = []
+    with contextlib.closing(read_workbook_sheets(file, sheets, usecols=column_filter(columns))) as reader:
+        for sheet in sheets:
+            source = f"{file}:{sheet}"
+            with stage('read_sheet', source=source) as record:
+                _, df = next(reader)
+                record['rows_out'] = len(df)
+            with stage('fingerprint_raw_sheet', source=source, rows_in=len(df)):
+                raw_fingerprint = frame_fingerprint(df)
+            if known_raw.get(sheet) == raw_fingerprint:
+                results.append((sheet, raw_fingerprint, None))
+            else:
+                results.append((sheet, raw_fingerprint, process_sheet(df, sheet, file, readable_id=readable_id)))
+    return results
+
+def _profiled_sheet_group(file, sheets, readable_id=True, known_raw=None, columns=None):
+    """
+    process_sheet_group for a worker process of a profiled run: also returns
+    the stages recorded in the worker so the parent can add them to its report
+    """
+    instrumentation.enable_profiling()
+    # Forked workers start with a copy of the parent's records
+    instrumentation.take_records()
+    results = process_sheet_group(file, sheets, readable_id, known_raw, columns)
+    return results, instrumentation.take_records()
+
+# Excel files to read when no inputs are given
 excel_files = ["Updated (07 -10 -2024) Batch 2021 to 2024.xlsx", "EDITED NIIT 10 sept 2024.xlsx"]
 
-# Dictionary to store file names as keys and their sheet names as values
-file_sheet_dict = {}
-
-# Get all sheet names for each file
-for file in excel_files:
-    try:
-        xls = pd.ExcelFile(file)
-        file_sheet_dict[file] = xls.sheet_names
-    except Exception as e:
-        print(f"Error reading {file}: {str(e)}")
-
-# Dictionary to store dataframes for each sheet
-sheet_data = {}
-
-# Read each sheet and store in dictionary
-for file, sheets in file_sheet_dict.items():
-    for sheet in sheets:
-        print(f"\nReading sheet: {sheet} from {file}")
-        df = pd.read_excel(file, sheet_name=sheet)
-        
-        # Standardize column names
-        df = standardize_columns(df, sheet, file)
-        
-        # Extract year from sheet name
-        year = extract_year_from_sheet(sheet)
-        print(year)
-        if year:
-            df['YEAR'] = year
-
-        # Clean course names
-        df = clean_course_names(df)
-        
-        # Clean duration
-        df = clean_duration(df)
-        
-        # Create unique identifier
-        df = create_unique_identifier(df)
-        
-        # Reorder columns to ensure consistent order
-        df = reorder_columns(df)
-        
-        # Extract gender
-        df = extract_gender(df)
-        
-        # Add employment status
-        df = add_employment_status(df)
-        
-        # Add present status
-        def get_present_status(row):
-            if row.get('EMPLOYMENT_STATUS') == 'Employed':
-                return 'Employed'
-            status = str(row.get('CURRENT_STATUS', '')).lower()
-            if any(x in status for x in ['student', 'pursuing', 'studying', 'school', 'college', 'class', 'std', 'b.a', 'b.com', 'b.sc', 'b.a.', 'b.com.', 'b.sc.', 'bachelor', 'llb', 'msc', 'maitreyi', 'ignou', 'du', 'nios', 'univ', 'university']):
-                return 'Student'
-            if any(x in status for x in ['home maker', 'homemaker', 'home-maker', 'home maker', 'home-maker', 'home maker', 'homermaker', 'home maker']):
-                return 'Homemaker'
-            if any(x in status for x in ['seeking job', 'seeking jobs', 'jobseeker', 'job seeker', 'seeking', 'looking for job', 'looking for work', 'seeking employment', 'seeking jobs in', 'seeking jobs as', 'seeking jobs at', 'seeking jobs', 'seeking job', 'seeking jobs', 'jobless', 'unemployed']):
-                return 'Jobseeker'
-            return 'Other'
-        df['PRESENT_STATUS'] = df.apply(get_present_status, axis=1)
-
-        # print(df[['PRESENT_STATUS', 'CURRENT_STATUS', 'EMPLOYMENT_STATUS']].drop_duplicates())
-        
-        sheet_data[f"{file}_{sheet}"] = df
-        
-        # Print standardized column names for each sheet
-        print(f"Standardized columns in {sheet}:")
-        print(df.columns.tolist())
-
-# print(sheet_data.values())
- 
\ No newline at end of file
+def resolve_inputs(patterns=None, inputs_file=None):
+    """
+    Expand input file names and glob patterns (e.g. 'exports/*.csv') into a
+    sorted, de-duplicated list of paths, defaulting to excel_files.
+
+    inputs_file is a JSON file holding a list of names/patterns, or an object
+    with an "inputs" list; relative entries are taken relative to that file.
+    A pattern matching nothing is kept as given so the missing file is reported.
+    """
+    entries = list(patterns or [])
+    if inputs_file:
+        with open(inputs_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(inputs_file))
+        configured = config.get('inputs', []) if isinstance(config, dict) else config
+        entries += [entry if os.path.isabs(entry) else os.path.join(base_dir, entry) for entry in configured]
+    if not entries:
+        return list(excel_files)
+
+    paths = []
+    for entry in entries:
+        matches = sorted(glob.glob(entry)) if glob.has_magic(entry) else [entry]
+        for path in matches or [entry]:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+def list_workbook_sheets(files, use_cache=True):
+    """
+    Return a dictionary with file names as keys and their sheet names as values,
+    along with the fingerprint of each workbook used as the cache key
+    """
+    from sheet_cache import workbook_fingerprint, remember_sheet_names
+    from workbook_reader import sheet_names
+
+    file_sheet_dict = {}
+    file_fingerprints = {}
+
+    for file in files:
+        try:
+            if use_cache:
+                fingerprint = workbook_fingerprint(file)
+                file_fingerprints[file] = fingerprint
+                if fingerprint.get('sheets') is not None:
+                    file_sheet_dict[file] = fingerprint['sheets']
+                    continue
+            with stage('list_sheets', source=file):
+                file_sheet_dict[file] = sheet_names(file)
+            if use_cache:
+                remember_sheet_names(fingerprint, file_sheet_dict[file])
+        except Exception as e:
+            logger.error("Error reading %s: %s", file, e)
+
+    return file_sheet_dict, file_fingerprints
+
+def build_sheet_data(file_sheet_dict, file_fingerprints=None, workers=1, use_cache=True, readable_id=True,
+                     columns=None):
+    """
+    Read and clean every sheet, returning a dictionary keyed by "<file>_<sheet>".
+    With columns (see read_columns), the other columns are never read.
+
+    With the cache enabled, a processing manifest records the fingerprint of each
+    sheet's raw and cleaned data. Sheets of unchanged workbooks are loaded from the
+    cache without opening the file; sheets of changed workbooks are read, and only
+    those whose raw data changed are cleaned again. The fingerprint of the cleaned
+    data is kept in df.attrs['fingerprint'].
+
+    Sheets are cleaned in a pool of `workers` processes when workers > 1. Results
+    are merged in workbook order, so the output is identical to a serial run.
+    """
+    from sheet_cache import (frame_fingerprint, load_cached_sheet, load_manifest, prune_cache,
+                             save_manifest, store_cached_sheet)
+
+    file_fingerprints = file_fingerprints or {}
+    use_cache = use_cache and bool(file_fingerprints)
+    settings = cache_settings(readable_id, columns)
+    cache_dir = cache_directory(columns)
+    manifest = load_manifest(cache_dir) if use_cache else {}
+    file_frames = {file: {} for file in file_sheet_dict}
+    skipped, reused, rebuilt = [], [], []
+
+    # Split the sheets that must be read into groups sharing one workbook handle
+    groups = []
+    for file, sheets in file_sheet_dict.items():
+        fingerprint = file_fingerprints.get(file)
+        recorded = manifest.get(fingerprint['path'], {}) if use_cache else {}
+        recorded_sheets = recorded.get('sheets', {})
+        unchanged_workbook = use_cache and recorded.get('sha256') == fingerprint['sha256']
+        pending_sheets = []
+        for sheet in sheets:
+            if unchanged_workbook and sheet in recorded_sheets:
+                df = load_cached_sheet(file, sheet, recorded_sheets[sheet]['raw'], settings, cache_dir)
+                if df is not None:
+                    df.attrs['fingerprint'] = recorded_sheets[sheet]['processed']
+                    file_frames[file][sheet] = df
+                    skipped.append((file, sheet))
+                    continue
+            pending_sheets.append(sheet)
+        # Raw fingerprints whose cleaned version is still in the cache
+        known_raw = {sheet: recorded_sheets[sheet]['raw'] for sheet in pending_sheets
+                     if sheet in recorded_sheets and not unchanged_workbook}
+        n_groups = min(max(workers, 1), len(pending_sheets))
+        for i in range(n_groups):
+            group = pending_sheets[i::n_groups]
+            groups.append((file, group, {sheet: known_raw[sheet] for sheet in group if sheet in known_raw}))
+
+    if workers > 1 and len(groups) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            if instrumentation.profiling_enabled():
+                futures = [executor.submit(_profiled_sheet_group, file, sheets, readable_id, known, columns)
+                           for file, sheets, known in groups]
+                results = []
+                for (file, _, _), future in zip(groups, futures):
+                    processed, records = future.result()
+                    instrumentation.add_records(records)
+                    results.append((file, processed))
+            else:
+                futures = [executor.submit(process_sheet_group, file, sheets, readable_id, known, columns)
+                           for file, sheets, known in groups]
+                results = [(file, future.result()) for (file, _, _), future in zip(groups, futures)]
+    else:
+        results = [(file, process_sheet_group(file, sheets, readable_id, known, columns))
+                   for file, sheets, known in groups]
+
+    raw_fingerprints = {}
+    for file, processed in results:
+        for sheet, raw_fingerprint, df in processed:
+            raw_fingerprints[(file, sheet)] = raw_fingerprint
+            if df is None:
+                # The raw sheet is unchanged, take its cleaned version from the cache
+                df = load_cached_sheet(file, sheet, raw_fingerprint, settings, cache_dir)
+                if df is not None:
+                    df.attrs['fingerprint'] = manifest[file_fingerprints[file]['path']]['sheets'][sheet]['processed']
+                    file_frames[file][sheet] = df
+                    reused.append((file, sheet))
+                    continue
+                # The cache entry disappeared; clean the sheet again
+                df = process_sheet_group(file, [sheet], readable_id, columns=columns)[0][2]
+
+            logger.debug("Read sheet %s from %s, year %s", sheet, file, extract_year_from_sheet(sheet))
+            # Log standardized column names for each sheet
+            logger.debug("Standardized columns in %s: %s", sheet, df.columns.tolist())
+
+            df.attrs['fingerprint'] = frame_fingerprint(df)
+            file_frames[file][sheet] = df
+            rebuilt.append((file, sheet))
+            if use_cache:
+                store_cached_sheet(file, sheet, raw_fingerprint, df, settings, cache_dir)
+
+    if use_cache:
+        # Record what every sheet was built from, dropping workbooks and sheets that are gone
+        new_manifest = {}
+        for file, sheets in file_sheet_dict.items():
+            path = file_fingerprints[file]['path']
+            previous = manifest.get(path, {}).get('sheets', {})
+            entry = {'sha256': file_fingerprints[file]['sha256'], 'sheets': {}}
+            for sheet in sheets:
+                if sheet not in file_frames[file]:
+                    continue
+                raw = raw_fingerprints.get((file, sheet)) or previous[sheet]['raw']
+                df = file_frames[file][sheet]
+                entry['sheets'][sheet] = {'raw': raw, 'processed': df.attrs['fingerprint'], 'rows': len(df)}
+            new_manifest[path] = entry
+        # Keep entries of workbooks that were not part of this run
+        for path, entry in manifest.items():
+            new_manifest.setdefault(path, entry)
+        save_manifest(new_manifest, cache_dir)
+        prune_cache(new_manifest, settings, cache_dir)
+
+    logger.info("Sheets: %d skipped (workbook unchanged), %d reused (sheet unchanged), %d rebuilt",
+                len(skipped), len(reused), len(rebuilt))
+    for file, sheet in rebuilt:
+        logger.info("  rebuilt: %s (%s)", sheet, file)
+
+    # Dictionary to store dataframes for each sheet, in workbook order
+    sheet_data = {}
+    for file, sheets in file_sheet_dict.items():
+        for sheet in sheets:
+            if sheet in file_frames[file]:
+                sheet_data[f"{file}_{sheet}"] = file_frames[file][sheet]
+
+    return sheet_data
+
+def combine_sheets(sheet_data):
+    """
+    Concatenate the cleaned sheets into one DataFrame. The categorical columns are
+    recoded to a shared set of categories so they stay categorical when combined.
+    """
+    frames = list(sheet_data.values())
+    if not frames:
+        return pd.DataFrame()
+    combined = pd.concat(frames, ignore_index=True)
+
+    for column in CATEGORICAL_COLUMNS:
+        if column not in combined.columns:
+            continue
+        parts = [pd.Categorical(df[column]) if column in df.columns else None for df in frames]
+        categories = pd.Index(sorted(set().union(*(part.categories for part in parts if part is not None))), dtype=object)
+        # Recode each sheet's codes into the shared categories; -1 (missing) stays -1
+        codes = []
+        for df, part in zip(frames, parts):
+            if part is None:
+                codes.append(np.full(len(df), -1, dtype=np.int32))
+            else:
+                recode = np.append(categories.get_indexer(part.categories.astype(object)), -1)
+                codes.append(recode[part.codes])
+        combined[column] = pd.Categorical.from_codes(np.concatenate(codes), categories=categories)
+
+    # Keep the hashed key integer; sheets without one become missing values, not float NaN
+    if KEY_COLUMN in combined.columns and any(KEY_COLUMN not in df.columns for df in frames):
+        values = np.concatenate([df[KEY_COLUMN].to_numpy(dtype=np.int64) if KEY_COLUMN in df.columns
+                                 else np.zeros(len(df), dtype=np.int64) for df in frames])
+        mask = np.concatenate([np.full(len(df), KEY_COLUMN not in df.columns) for df in frames])
+        combined[KEY_COLUMN] = pd.arrays.IntegerArray(values, mask)
+
+    return combined
+
+# Memoized results of load_sheet_data, keyed by the input files and their stat
+_sheet_data_memo = {}
+
+def _memo_key(paths, *options):
+    """
+    Key identifying a set of input files in their current state on disk
+    """
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stats.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stats.append((os.path.abspath(path), None, None))
+    return (tuple(stats),) + options
+
+def load_sheet_data(paths=None, workers=1, use_cache=True, readable_id=True, columns=None):
+    """
+    Read and clean every sheet of the given workbooks, defaulting to excel_files.
+    With columns, only those and the columns the cleaning stages need are read
+    (see read_columns); by default every column is.
+
+    Nothing is read until this is called. Repeated calls in the same process
+    return the memoized result until one of the workbooks changes on disk.
+    The returned DataFrames are shared between callers and must not be
+    modified in place. With readable_id=False the UNIQUE_ID string column is
+    skipped and only the integer STUDENT_KEY is produced.
+    """
+    paths = list(excel_files if paths is None else paths)
+    columns = read_columns(columns)
+    key = _memo_key(paths, use_cache, readable_id, tuple(columns) if columns is not None else None)
+    if key not in _sheet_data_memo:
+        file_sheet_dict, file_fingerprints = list_workbook_sheets(paths, use_cache=use_cache)
+        sheet_data = build_sheet_data(file_sheet_dict, file_fingerprints, workers=workers, use_cache=use_cache,
+                                      readable_id=readable_id, columns=columns)
+        # Forget earlier versions of the same inputs, so a long-running process
+        # (e.g. watch mode) keeps one copy of the data
+        for stale in [memo for memo in _sheet_data_memo
+                      if memo[1:] == key[1:] and [stat[0] for stat in memo[0]] == [stat[0] for stat in key[0]]]:
+            del _sheet_data_memo[stale]
+        _sheet_data_memo[key] = (file_sheet_dict, sheet_data)
+    return _sheet_data_memo[key][1]
+
+def __getattr__(name):
+    """
+    Keep `from extract_excel_data import sheet_data, file_sheet_dict` working,
+    loading the default workbooks on first access instead of at import
+    """
+    if name in ('sheet_data', 'file_sheet_dict'):
+        sheet_data = load_sheet_data()
+        if name == 'sheet_data':
+            return sheet_data
+        return _sheet_data_memo[_memo_key(excel_files, True, True, None)][0]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def add_arguments(parser):
+    """
+    Add the data loading options shared by every command line entry point
+    """
+    parser.add_argument('--workers', type=int, default=1, help="Number of processes used to clean sheets in parallel")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore the on-disk sheet cache")
+    parser.add_argument('--no-readable-id', action='store_true',
+                        help="Skip the UNIQUE_ID string column and identify students by the integer STUDENT_KEY only")
+    parser.add_argument('--inputs-file', metavar='JSON',
+                        help='JSON file listing the input files or glob patterns to read')
+    parser.add_argument('files', nargs='*',
+                        help="Workbooks, CSV or Parquet files or glob patterns such as 'exports/*.csv' "
+                             "(default: the configured excel_files)")
+    instrumentation.add_arguments(parser)
+
+def main(argv=None):
+    """
+    Command line entry point: read and clean the workbooks and list the sheets
+    """
+    parser = argparse.ArgumentParser(description="Read and clean the student enrollment workbooks")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start_run(args)
+
+    paths = resolve_inputs(args.files, args.inputs_file)
+    sheet_data = load_sheet_data(paths, workers=args.workers, use_cache=not args.no_cache,
+                                 readable_id=not args.no_readable_id)
+    for key, df in sheet_data.items():
+        logger.info("%s: %d rows", key, len(df))
+
+    instrumentation.finish_run(args)
+
+if __name__ == "__main__":
+    main()
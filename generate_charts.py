@@ -1,63 +1,152 @@
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
+import argparse
+import logging
 import sys
 import os
 
 # Import the data processing functions from extract_excel_data.py
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from extract_excel_data import sheet_data, file_sheet_dict
+from extract_excel_data import (ID_COLUMNS, KEY_COLUMN, add_arguments, cache_directory, combine_sheets,
+                                excel_files, load_sheet_data, read_columns, resolve_inputs)
+from aggregates import (CUBE_DIMENSIONS, INCOME_BAND_ORDER, build_cube, export_cube, partition_table, rollup,
+                        update_aggregates)
+from dashboard_writer import OUTPUT_MODES, write_dashboard
+from entity_resolution import MATCH_COLUMNS, PERSON_COLUMN, count_people, resolve_people
+import instrumentation
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_FILE = 'student_enrollment_dashboard.html'
+DASHBOARD_TITLE = 'Student Enrollment Analysis for Computer Class in Shanti Sahyog NGO'
+
+# Columns the charts are computed from; with entity resolution the MATCH_COLUMNS
+# are read as well, and every other column of the sheets is skipped
+DASHBOARD_COLUMNS = CUBE_DIMENSIONS + [KEY_COLUMN, 'INCOME']
 
 def check_combination_uniqueness(df):
     """
     Check if the combination of ADM_NO, STUDENT, FATHER_HUSBAND, COURSE, DURATION, YEAR is unique
     """
     # Define the columns to check for uniqueness
-    columns_to_check = ['ADM_NO', 'STUDENT', 'FATHER_HUSBAND', 'COURSE', 'DURATION', 'YEAR']
+    columns_to_check = ID_COLUMNS
     
     # Check if all required columns exist
-    missing_columns = [col for col in columns_to_check if col not in df.columns]
+    missing_columns = [col for col in columns_to_check + [KEY_COLUMN] if col not in df.columns]
     if missing_columns:
-        print(f"Warning: Missing columns: {missing_columns}")
+        logger.warning("Missing columns: %s", missing_columns)
         return None
     
-    # Create the combination
-    combination = df[columns_to_check].astype(str)
-    
-    # Check for duplicates
-    duplicates = combination.duplicated(keep=False)
+    # Check for duplicates on the hashed key of the combination
+    duplicates = df[KEY_COLUMN].duplicated(keep=False).to_numpy()
     duplicate_count = duplicates.sum()
     total_records = len(df)
     
-    print(f"\n=== Uniqueness Check Results ===")
-    print(f"Total records: {total_records}")
-    print(f"Duplicate combinations: {duplicate_count}")
-    print(f"Unique combinations: {total_records - duplicate_count}")
-    print(f"Uniqueness percentage: {((total_records - duplicate_count) / total_records * 100):.2f}%")
+    logger.info("=== Uniqueness Check Results ===")
+    logger.info("Total records: %d", total_records)
+    logger.info("Duplicate combinations: %d", duplicate_count)
+    logger.info("Unique combinations: %d", total_records - duplicate_count)
+    logger.info("Uniqueness percentage: %.2f%%", (total_records - duplicate_count) / total_records * 100)
     
     if duplicate_count > 0:
-        print(f"\n=== Duplicate Records Found ===")
-        duplicate_records = df[duplicates].sort_values(columns_to_check)
-        print(f"First few duplicate records:")
-        print(duplicate_records[columns_to_check].head(10))
-        
-        # Show duplicate combinations with their counts
-        duplicate_combinations = combination[duplicates].value_counts()
-        print(f"\nDuplicate combinations and their counts:")
-        print(duplicate_combinations.head(10))
+        logger.warning("%d records share their combination with another record", duplicate_count)
+        if logger.isEnabledFor(logging.DEBUG):
+            duplicate_records = df[duplicates].sort_values(columns_to_check)
+            logger.debug("First few duplicate records:\n%s", duplicate_records[columns_to_check].head(10))
+
+            # Show duplicate combinations with their counts
+            duplicate_combinations = duplicate_records[columns_to_check].astype(str).value_counts()
+            logger.debug("Duplicate combinations and their counts:\n%s", duplicate_combinations.head(10))
     else:
-        print("✓ All combinations are unique!")
+        logger.info("✓ All combinations are unique!")
     
     return duplicate_count == 0
 
-def create_combined_charts(df):
+def grouped_bar_trace(counts, x_column, x_order, group_column, group_order, group_colors,
+                      value_column='count', group_width=0.8, **bar_options):
     """
-    Create a single HTML file with both charts
+    Build a grouped bar chart as a single go.Bar trace instead of one trace per group.
+
+    Every (x, group) pair gets a bar (missing pairs are 0), placed side by side with
+    per-point offsets and colored by group. The group name is passed as customdata
+    so hover templates can show it with %{customdata}.
     """
-    # Create subplots with 8 rows and 1 column (add Present Status Pie)
+    import plotly.graph_objects as go
+
+    grid = pd.MultiIndex.from_product([x_order, group_order], names=[x_column, group_column])
+    points = counts.set_index([x_column, group_column])[value_column].reindex(grid, fill_value=0).reset_index()
+    width = group_width / max(len(group_order), 1)
+    slots = np.tile(np.arange(len(group_order)), len(x_order))
+    return go.Bar(
+        x=points[x_column],
+        y=points[value_column],
+        text=points[value_column],
+        textposition='auto',
+        width=width,
+        offset=slots * width - group_width / 2,
+        marker_color=points[group_column].map(group_colors),
+        customdata=points[group_column],
+        **bar_options
+    )
+
+# Name of each chart's aggregate, in dashboard order
+CHARTS = ['enrollment_by_year', 'enrollment_by_year_course', 'course_by_duration', 'gender',
+          'gender_by_year', 'employment_by_year', 'employed_by_year_course', 'present_status',
+          'income_bands_by_year', 'median_income_by_year_course']
+
+def chart_aggregates(cube, where=None, charts=None):
+    """
+    The distinct-student counts behind each chart, as {chart name: DataFrame},
+    optionally restricted to the cube cells matching `where` (see aggregates.rollup)
+    and to the given chart names. The income charts are kept per year and
+    course, so they follow the YEAR and COURSE filters of where only.
+    """
+    where = dict(where or {})
+    employed = dict(where, EMPLOYMENT_STATUS='Employed')
+    queries = {
+        'enrollment_by_year': lambda: rollup(cube, ['YEAR'], where=where),
+        'enrollment_by_year_course': lambda: rollup(cube, ['YEAR', 'COURSE'], where=where),
+        'course_by_duration': lambda: rollup(cube, ['COURSE', 'DURATION'], where=where),
+        'gender': lambda: rollup(cube, ['GENDER'], where=where),
+        'gender_by_year': lambda: rollup(cube, ['YEAR', 'GENDER'], where=where),
+        'employment_by_year': lambda: pd.merge(
+            rollup(cube, ['YEAR'], where=where, name='Total Students'),
+            rollup(cube, ['YEAR'], where=employed, name='Employed Students'),
+            on='YEAR', how='left').fillna({'Employed Students': 0}),
+        'employed_by_year_course': lambda: rollup(cube, ['YEAR', 'COURSE'], where=employed, name='Employed Students'),
+        'present_status': lambda: rollup(cube, ['PRESENT_STATUS'], where=where),
+        'income_bands_by_year': lambda: partition_table(cube, 'income_bands', where)
+            .groupby(['YEAR', 'INCOME_BAND'])['STUDENTS'].sum().reset_index(name='count'),
+        'median_income_by_year_course': lambda: partition_table(cube, 'income_quantiles', where),
+    }
+    return {name: queries[name]() for name in (charts or CHARTS)}
+
+def build_dashboard_figure(cube, people=None, title=DASHBOARD_TITLE):
+    """
+    Build the ten-chart dashboard figure.
+
+    Every chart is a rollup of the aggregation cube (see aggregates.build_cube), so
+    the student-level data is only scanned once however many charts there are.
+    `people` is an optional DataFrame of unique people per YEAR (see
+    entity_resolution.count_people), shown next to the enrollments in chart 1.
+    """
+    # Plotly is only imported when a dashboard is actually rendered
+    import plotly.graph_objects as go
+    import plotly.express as px
+    from plotly.subplots import make_subplots
+
+    # One row per chart; the legend boxes are placed at the top of their row
+    rows = len(CHARTS)
+    spacing = 0.06
+    row_height = (1 - spacing * (rows - 1)) / rows
+
+    def row_top(row):
+        return 1 - (row - 1) * (row_height + spacing)
+
+    # Create subplots with 10 rows and 1 column
     fig = make_subplots(
-        rows=8, cols=1,
+        rows=rows, cols=1,
         subplot_titles=[
             'Student Enrollment by Year',
             'Student Enrollment by Year and Course',
@@ -66,14 +155,18 @@ def create_combined_charts(df):
             'Gender Distribution per Year',
             'Total vs Employed Students per Year',
             'Employed Students per Year and Course',
-            ''  # No subplot title for the pie chart
+            '',  # No subplot title for the pie chart
+            'Students by Monthly Income Band per Year',
+            'Median Monthly Income of Employed Students per Year and Course'
         ],
-        vertical_spacing=0.08,  # Adjusted for 8 charts
-        specs=[[{"type": "bar"}], [{"type": "bar"}], [{"type": "bar"}], [{"type": "pie"}], [{"type": "bar"}], [{"type": "bar"}], [{"type": "bar"}], [{"type": "pie"}]]
+        vertical_spacing=spacing,
+        specs=[[{"type": "bar"}], [{"type": "bar"}], [{"type": "bar"}], [{"type": "pie"}], [{"type": "bar"}], [{"type": "bar"}], [{"type": "bar"}], [{"type": "pie"}], [{"type": "bar"}], [{"type": "bar"}]]
     )
     
-    # Chart 1: Overall enrollment by year (using UNIQUE_ID for counting)
-    yearly_counts = df.groupby('YEAR')['UNIQUE_ID'].nunique().sort_index()
+    data = chart_aggregates(cube)
+
+    # Chart 1: Overall enrollment by year (distinct students from the cube)
+    yearly_counts = data['enrollment_by_year'].set_index('YEAR')['count']
     
     fig.add_trace(
         go.Bar(
@@ -89,65 +182,67 @@ def create_combined_charts(df):
         ),
         row=1, col=1
     )
-    
-    # Assign a color to each course (for both charts)
-    all_courses = sorted(df['COURSE'].dropna().unique())
-    colors = px.colors.qualitative.Set3 * ((len(all_courses) // len(px.colors.qualitative.Set3)) + 1)
-    course_color_map = {course: colors[i] for i, course in enumerate(all_courses)}
-
-    # Chart 2: Course-wise enrollment by year (using UNIQUE_ID for counting)
-    course_yearly_counts = df.groupby(['YEAR', 'COURSE'])['UNIQUE_ID'].nunique().reset_index(name='count')
-    # Define the correct chronological order for years
-    year_order = sorted(df['YEAR'].dropna().unique(), key=lambda x: (int(x.split('-')[0]), int(x.split('-')[1])))
-    course_yearly_counts['YEAR'] = pd.Categorical(course_yearly_counts['YEAR'], categories=year_order, ordered=True)
-    course_yearly_counts = course_yearly_counts.sort_values(['COURSE', 'YEAR'])
-
-    for i, course in enumerate(all_courses):
-        course_data = course_yearly_counts[course_yearly_counts['COURSE'] == course]
-        # Ensure x is in the correct order and all years are present
-        course_data = course_data.set_index('YEAR').reindex(year_order).reset_index()
-        showlegend = True  # Only show legend for the first trace of each course
+    if people is not None:
+        yearly_people = people.set_index('YEAR')['count']
         fig.add_trace(
             go.Bar(
-                x=course_data['YEAR'],
-                y=course_data['count'].fillna(0),
-                name=course,
-                text=course_data['count'].fillna(0),
+                x=yearly_people.index,
+                y=yearly_people.values,
+                text=yearly_people.values,
                 textposition='auto',
-                marker_color=course_color_map[course],
-                legendgroup=course,
-                showlegend=showlegend,
+                marker_color='#f4a261',
+                name='Unique People',
                 hovertemplate='<b>Year:</b> %{x}<br>' +
-                             f'<b>Course:</b> {course}<br>' +
-                             '<b>Number of Students:</b> %{y}<br>' +
+                             '<b>Unique People:</b> %{y}<br>' +
                              '<extra></extra>'
             ),
-            row=2, col=1
+            row=1, col=1
         )
+    
+    # Assign a color to each course (for both charts)
+    all_courses = sorted(cube['counts']['COURSE'].dropna().unique())
+    colors = px.colors.qualitative.Set3 * ((len(all_courses) // len(px.colors.qualitative.Set3)) + 1)
+    course_color_map = {course: colors[i] for i, course in enumerate(all_courses)}
+
+    # Chart 2: Course-wise enrollment by year
+    course_yearly_counts = data['enrollment_by_year_course']
+    # Define the correct chronological order for years
+    year_order = sorted(cube['counts']['YEAR'].dropna().unique(), key=lambda x: (int(x.split('-')[0]), int(x.split('-')[1])))
 
-    # Chart 3: Course popularity by duration (using UNIQUE_ID for counting)
-    course_duration_counts = df.groupby(['COURSE', 'DURATION'])['UNIQUE_ID'].nunique().reset_index(name='count')
-    course_duration_counts['COURSE_DURATION'] = course_duration_counts['COURSE'] + ' (' + course_duration_counts['DURATION'] + ')'
+    # One trace for all courses, with the course bars of each year side by side
+    fig.add_trace(
+        grouped_bar_trace(
+            course_yearly_counts, 'YEAR', year_order, 'COURSE', all_courses, course_color_map,
+            name='Students by Course',
+            hovertemplate='<b>Year:</b> %{x}<br>' +
+                         '<b>Course:</b> %{customdata}<br>' +
+                         '<b>Number of Students:</b> %{y}<br>' +
+                         '<extra></extra>'
+        ),
+        row=2, col=1
+    )
+
+    # Chart 3: Course popularity by duration
+    course_duration_counts = data['course_by_duration']
+    course_duration_counts['COURSE_DURATION'] = course_duration_counts['COURSE'].astype(str) + ' (' + course_duration_counts['DURATION'].astype(str) + ')'
     course_duration_counts = course_duration_counts.sort_values('count', ascending=False)
 
-    # Add a bar for each course+duration, using the course color, legend shows course+duration
-    for _, row in course_duration_counts.iterrows():
-        fig.add_trace(
-            go.Bar(
-                x=[row['COURSE_DURATION']],
-                y=[row['count']],
-                text=[row['count']],
-                textposition='auto',
-                marker_color=course_color_map[row['COURSE']],
-                name=row['COURSE_DURATION'],
-                legendgroup=row['COURSE'],
-                showlegend=True,
-                hovertemplate='<b>Course:</b> %{x}<br>' +
-                             '<b>Number of Students:</b> %{y}<br>' +
-                             '<extra></extra>'
-            ),
-            row=3, col=1
-        )
+    # A single trace with a bar for each course+duration, colored by course
+    fig.add_trace(
+        go.Bar(
+            x=course_duration_counts['COURSE_DURATION'],
+            y=course_duration_counts['count'],
+            text=course_duration_counts['count'],
+            textposition='auto',
+            marker_color=course_duration_counts['COURSE'].map(course_color_map),
+            customdata=course_duration_counts['COURSE'],
+            name='Course Popularity',
+            hovertemplate='<b>Course:</b> %{x}<br>' +
+                         '<b>Number of Students:</b> %{y}<br>' +
+                         '<extra></extra>'
+        ),
+        row=3, col=1
+    )
     
     # Define gender color map
     gender_color_map = {
@@ -155,8 +250,8 @@ def create_combined_charts(df):
         'Female': '#F653A6'   # pink
     }
 
-    # Chart 4: Gender distribution (using UNIQUE_ID for counting)
-    gender_counts = df.groupby('GENDER')['UNIQUE_ID'].nunique().reset_index(name='count')
+    # Chart 4: Gender distribution
+    gender_counts = data['gender']
     gender_counts = gender_counts[gender_counts['GENDER'] != 'Unknown']  # Optionally exclude 'Unknown'
 
     # Only show legend for gender in pie chart, not in bar chart (handled below)
@@ -179,8 +274,8 @@ def create_combined_charts(df):
         row=4, col=1
     )
     
-    # Chart 5: Gender distribution per year (bar chart, using UNIQUE_ID for counting)
-    gender_year_counts = df.groupby(['YEAR', 'GENDER'])['UNIQUE_ID'].nunique().reset_index(name='count')
+    # Chart 5: Gender distribution per year (bar chart)
+    gender_year_counts = data['gender_by_year']
     gender_year_counts = gender_year_counts[gender_year_counts['GENDER'] != 'Unknown']  # Optionally exclude 'Unknown'
     gender_list = gender_year_counts['GENDER'].unique()
 
@@ -205,9 +300,7 @@ def create_combined_charts(df):
         )
 
     # Chart 6: Total vs Employed Students per Year
-    total_per_year = df.groupby('YEAR')['UNIQUE_ID'].nunique().reset_index(name='Total Students')
-    employed_per_year = df[df['EMPLOYMENT_STATUS'] == 'Employed'].groupby('YEAR')['UNIQUE_ID'].nunique().reset_index(name='Employed Students')
-    merged_year = pd.merge(total_per_year, employed_per_year, on='YEAR', how='left').fillna(0)
+    merged_year = data['employment_by_year']
     x_years = merged_year['YEAR']
     fig.add_trace(
         go.Bar(
@@ -239,29 +332,19 @@ def create_combined_charts(df):
     )
 
     # Chart 7: Employed Students per Year and Course (no total, sorted by year)
-    employed_per_year_course = df[df['EMPLOYMENT_STATUS'] == 'Employed'].groupby(['YEAR', 'COURSE'])['UNIQUE_ID'].nunique().reset_index(name='Employed Students')
-    # Sort years as in chart 2 and fill missing years with 0 for each course
-    employed_per_year_course['YEAR'] = pd.Categorical(employed_per_year_course['YEAR'], categories=year_order, ordered=True)
-    employed_per_year_course = employed_per_year_course.sort_values(['COURSE', 'YEAR'])
-    for course in all_courses:
-        course_data = employed_per_year_course[employed_per_year_course['COURSE'] == course].set_index('YEAR').reindex(year_order).reset_index()
-        fig.add_trace(
-            go.Bar(
-                x=course_data['YEAR'],
-                y=course_data['Employed Students'].fillna(0),
-                name=f'Employed Students - {course}',
-                marker_color=course_color_map[course],
-                text=course_data['Employed Students'].fillna(0),
-                textposition='auto',
-                legendgroup=f'employment_{course}',
-                showlegend=False,
-                hovertemplate=f'<b>Year:</b> %{{x}}<br>Employed Students ({course}): %{{y}}<extra></extra>'
-            ),
-            row=7, col=1
-        )
+    employed_per_year_course = data['employed_by_year_course']
+    fig.add_trace(
+        grouped_bar_trace(
+            employed_per_year_course, 'YEAR', year_order, 'COURSE', all_courses, course_color_map,
+            value_column='Employed Students',
+            name='Employed Students by Course',
+            hovertemplate='<b>Year:</b> %{x}<br>Employed Students (%{customdata}): %{y}<extra></extra>'
+        ),
+        row=7, col=1
+    )
 
     # Chart 8: Present Status Pie Chart (Outcomes for students after course completion)
-    present_status_counts = df.groupby('PRESENT_STATUS')['UNIQUE_ID'].nunique().reset_index(name='count')
+    present_status_counts = data['present_status']
     present_status_color_map = {
         'Employed': '#2ca02c',
         'Student': '#1f77b4',
@@ -291,7 +374,7 @@ def create_combined_charts(df):
     fig.add_annotation(
         dict(
             x=0.5,
-            y=0.08,
+            y=row_top(8) + 0.02,
             xref='paper',
             yref='paper',
             text='Outcomes for Students after Course Completion (Status)',
@@ -302,11 +385,41 @@ def create_combined_charts(df):
         )
     )
 
-    # Update layout for 8 rows
+    # Chart 9: Students per monthly income band and year
+    income_band_counts = data['income_bands_by_year']
+    income_band_color_map = dict(zip(INCOME_BAND_ORDER, px.colors.sequential.Viridis[::-1][:len(INCOME_BAND_ORDER) - 1]
+                                     + ['#CCCCCC']))
+    fig.add_trace(
+        grouped_bar_trace(
+            income_band_counts, 'YEAR', year_order, 'INCOME_BAND', INCOME_BAND_ORDER, income_band_color_map,
+            name='Students by Income Band',
+            hovertemplate='<b>Year:</b> %{x}<br>' +
+                         '<b>Monthly income (Rs.):</b> %{customdata}<br>' +
+                         '<b>Number of Students:</b> %{y}<br>' +
+                         '<extra></extra>'
+        ),
+        row=9, col=1
+    )
+
+    # Chart 10: Median monthly income of employed students per year and course
+    # Years and courses without earners have no median and get no bar
+    income_quantiles = data['median_income_by_year_course'].dropna(subset=['MEDIAN']).copy()
+    income_quantiles['MEDIAN'] = income_quantiles['MEDIAN'].astype('float64').round().astype('int64')
+    fig.add_trace(
+        grouped_bar_trace(
+            income_quantiles, 'YEAR', year_order, 'COURSE', all_courses, course_color_map,
+            value_column='MEDIAN',
+            name='Median Income by Course',
+            hovertemplate='<b>Year:</b> %{x}<br>Median monthly income (%{customdata}): Rs. %{y}<extra></extra>'
+        ),
+        row=10, col=1
+    )
+
+    # Update layout for 10 rows
     fig.update_layout(
-        title='Student Enrollment Analysis for Computer Class in Shanti Sahyog NGO',
+        title=title,
         template='plotly_white',
-        height=2900,  # Increased height for 8 charts
+        height=3600,  # Increased height for 10 charts
         showlegend=False,
         barmode='group',
         margin=dict(l=60, r=260, t=80, b=80)
@@ -329,18 +442,48 @@ def create_combined_charts(df):
     fig.update_yaxes(title_text="Number of Students", row=7, col=1)
     fig.update_xaxes(title_text="Present Status", row=8, col=1)
     fig.update_yaxes(title_text="Number of Students", row=8, col=1)
+    fig.update_xaxes(title_text="Academic Year", row=9, col=1)
+    fig.update_yaxes(title_text="Number of Students", row=9, col=1)
+    fig.update_xaxes(title_text="Academic Year", row=10, col=1)
+    fig.update_yaxes(title_text="Median Monthly Income (Rs.)", row=10, col=1)
     
     # Rotate x-axis labels for the third and fifth chart to prevent overlap
     fig.update_xaxes(tickangle=45, row=3, col=1)
     fig.update_xaxes(tickangle=45, row=5, col=1)
     
-    # In the layout, set category_orders for the x-axis of row 2 and 5
+    # In the layout, set category_orders for the x-axis of rows 2, 5, 7, 9 and 10
     fig.update_xaxes(categoryorder='array', categoryarray=year_order, row=2, col=1)
     fig.update_xaxes(categoryorder='array', categoryarray=year_order, row=5, col=1)
+    fig.update_xaxes(categoryorder='array', categoryarray=year_order, row=7, col=1)
+    fig.update_xaxes(categoryorder='array', categoryarray=year_order, row=9, col=1)
+    fig.update_xaxes(categoryorder='array', categoryarray=year_order, row=10, col=1)
     
     # Hide the global legend
     fig.update_layout(showlegend=False)
 
+    # Add custom legend for Chart 1 when unique people are shown
+    if people is not None:
+        people_legend_text = "<b>Enrollment</b><br>" + \
+            "<span style='color:skyblue'>&#9632;</span> Total Students<br>" + \
+            "<span style='color:#f4a261'>&#9632;</span> Unique People"
+        fig.add_annotation(
+            dict(
+                x=1.01,
+                y=row_top(1) - 0.01,
+                xref='paper',
+                yref='paper',
+                text=people_legend_text,
+                showarrow=False,
+                align='left',
+                xanchor='left',
+                yanchor='top',
+                font=dict(size=13),
+                bordercolor="#cccccc",
+                borderwidth=1,
+                bgcolor="#fff"
+            )
+        )
+
     # Add custom legend for Chart 2 (Course-wise enrollment by year)
     course_legend_text = "<b>Course</b><br>" + "<br>".join(
         f"<span style='color:{course_color_map[c]}'>&#9632;</span> {c}" for c in all_courses
@@ -348,7 +491,7 @@ def create_combined_charts(df):
     fig.add_annotation(
         dict(
             x=1.01,
-            y=0.85,
+            y=row_top(2) - 0.01,
             xref='paper',
             yref='paper',
             text=course_legend_text,
@@ -370,7 +513,7 @@ def create_combined_charts(df):
     fig.add_annotation(
         dict(
             x=1.01,
-            y=0.72,  # Chart 3 legend
+            y=row_top(3) - 0.01,  # Chart 3 legend
             xref='paper',
             yref='paper',
             text=course_duration_legend_text,
@@ -392,7 +535,7 @@ def create_combined_charts(df):
     fig.add_annotation(
         dict(
             x=1.01,
-            y=0.60,  # Chart 4 legend
+            y=row_top(4) - 0.01,  # Chart 4 legend
             xref='paper',
             yref='paper',
             text=gender_legend_text,
@@ -410,7 +553,7 @@ def create_combined_charts(df):
     fig.add_annotation(
         dict(
             x=1.01,
-            y=0.45,  # Chart 5 legend
+            y=row_top(5) - 0.01,  # Chart 5 legend
             xref='paper',
             yref='paper',
             text=gender_legend_text,
@@ -431,7 +574,7 @@ def create_combined_charts(df):
     fig.add_annotation(
         dict(
             x=1.01,
-            y=0.3,  # Chart 6 legend
+            y=row_top(6) - 0.01,  # Chart 6 legend
             xref='paper',
             yref='paper',
             text=employment_legend_text,
@@ -452,7 +595,7 @@ def create_combined_charts(df):
     fig.add_annotation(
         dict(
             x=1.01,
-            y=0.20,  # Chart 7 legend
+            y=row_top(7) - 0.01,  # Chart 7 legend
             xref='paper',
             yref='paper',
             text=employment_course_legend_text,
@@ -473,7 +616,7 @@ def create_combined_charts(df):
     fig.add_annotation(
         dict(
             x=1.01,
-            y=0.01,
+            y=row_top(8) - row_height + 0.01,
             xref='paper',
             yref='paper',
             text=present_status_legend_text,
@@ -487,30 +630,273 @@ def create_combined_charts(df):
             bgcolor="#fff"
         )
     )
+    # Add custom legend for Chart 9 (Income Bands)
+    income_band_legend_text = "<b>Monthly Income (Rs.)</b><br>" + "<br>".join(
+        f"<span style='color:{income_band_color_map[b]}'>&#9632;</span> {b}" for b in INCOME_BAND_ORDER
+    )
+    fig.add_annotation(
+        dict(
+            x=1.01,
+            y=row_top(9) - 0.01,  # Chart 9 legend
+            xref='paper',
+            yref='paper',
+            text=income_band_legend_text,
+            showarrow=False,
+            align='left',
+            xanchor='left',
+            yanchor='top',
+            font=dict(size=13),
+            bordercolor="#cccccc",
+            borderwidth=1,
+            bgcolor="#fff"
+        )
+    )
+    # Add custom legend for Chart 10 (Median Income by Course)
+    fig.add_annotation(
+        dict(
+            x=1.01,
+            y=row_top(10) - 0.01,  # Chart 10 legend
+            xref='paper',
+            yref='paper',
+            text=employment_course_legend_text,
+            showarrow=False,
+            align='left',
+            xanchor='left',
+            yanchor='top',
+            font=dict(size=13),
+            bordercolor="#cccccc",
+            borderwidth=1,
+            bgcolor="#fff"
+        )
+    )
+
+    return fig
+
+def create_combined_charts(cube, output_path=DASHBOARD_FILE, output_mode='inline', gzip_output=False, people=None):
+    """
+    Create a single HTML file with all the charts.
+    See dashboard_writer.write_dashboard for the output modes.
+    """
+    with stage('build_dashboard_figure'):
+        fig = build_dashboard_figure(cube, people=people)
 
     # Save the combined chart
-    fig.write_html('student_enrollment_dashboard.html')
-    print("Combined dashboard saved as 'student_enrollment_dashboard.html'")
+    with stage('write_dashboard', source=output_path):
+        write_dashboard(fig, output_path, mode=output_mode, gzip_output=gzip_output)
+    logger.info("Combined dashboard saved as '%s'", output_path)
 
-def create_student_enrollment_charts():
+def load_aggregates(paths=None, workers=1, use_cache=True, readable_id=True, resolve_entities=True, stream=False,
+                    chunk_size=None, from_db=None, sync_db=None, all_columns=False, validate=False,
+                    validation_report=None, max_violations=0):
     """
-    Create interactive bar charts for student enrollment analysis
+    Read, clean and aggregate the inputs. Returns (cube, people_df): the
+    aggregation cube and a frame with the PERSON_ID of every record (every
+    distinct profile in streaming mode), or None without resolve_entities.
+
+    With stream, the workbooks are read and cleaned chunk_size rows at a time
+    (see streaming.stream_aggregates) and neither the sheets nor the combined
+    frame are held in memory. The sheet cache is not used in that mode.
+
+    With from_db, nothing is read: the cube is computed by SQL queries on the
+    SQLite store at that path (see store.load_cube). With sync_db, the cleaned
+    sheets are first upserted into the store at that path.
+
+    Only DASHBOARD_COLUMNS (and MATCH_COLUMNS with resolve_entities) are read
+    from the sheets, unless all_columns is set or the store needs every column.
+
+    With validate, the cleaned sheets are checked against the validation rules
+    before anything is aggregated (see validation.check_sheets), and
+    validation.ValidationFailed is raised when an 'error' rule has more than
+    max_violations violating rows. This needs the sheets, so it cannot be
+    combined with stream or from_db.
     """
-    # Combine all dataframes
-    all_data = []
-    for df in sheet_data.values():
-        all_data.append(df)
-    
-    combined_df = pd.concat(all_data, ignore_index=True)
+    if validate and (stream or from_db):
+        raise ValueError("Validation needs the cleaned sheets and cannot be combined with streaming or the store")
+
+    if from_db:
+        from store import load_cube, load_profiles
+
+        cube = load_cube(from_db)
+        people_df = None
+        if resolve_entities:
+            people_df = load_profiles(from_db)
+            people_df[PERSON_COLUMN] = resolve_people(people_df)
+        return cube, people_df
+
+    if stream:
+        from streaming import stream_aggregates
+
+        return stream_aggregates(paths, chunk_size=chunk_size, readable_id=readable_id,
+                                 resolve_entities=resolve_entities)
+
+    columns = None
+    if not (all_columns or sync_db):
+        columns = DASHBOARD_COLUMNS + (MATCH_COLUMNS if resolve_entities else [])
+        if validate:
+            from validation import VALIDATION_COLUMNS
+
+            columns = columns + VALIDATION_COLUMNS
+
+    # Read and clean every sheet, in parallel when workers > 1
+    sheet_data = load_sheet_data(paths, workers=workers, use_cache=use_cache, readable_id=readable_id,
+                                 columns=columns)
+    if validate:
+        from validation import check_sheets
+
+        check_sheets(sheet_data, validation_report, max_violations)
+    if sync_db:
+        from store import sync_sheets
+
+        sync_sheets(sheet_data, sync_db, files=list(excel_files if paths is None else paths))
+
+    # Combine all dataframes, keeping the low-cardinality columns categorical
+    with stage('combine_sheets', rows_in=sum(len(df) for df in sheet_data.values())) as record:
+        combined_df = combine_sheets(sheet_data)
     
-    # Remove rows where YEAR is None
-    combined_df = combined_df.dropna(subset=['YEAR'])
+        # Remove rows where YEAR is None
+        combined_df = combined_df.dropna(subset=['YEAR'])
+        record['rows_out'] = len(combined_df)
     
     # Check combination uniqueness
-    is_unique = check_combination_uniqueness(combined_df)
+    with stage('check_combination_uniqueness', rows_in=len(combined_df)):
+        is_unique = check_combination_uniqueness(combined_df)
+
+    # Link records of the same person across courses, years and workbooks
+    people_df = None
+    if resolve_entities:
+        combined_df[PERSON_COLUMN] = resolve_people(combined_df)
+        people_df = combined_df
+
+    # Count distinct students once per cube cell. With the cache, only the year/course
+    # partitions whose sheets changed since the last run are recomputed
+    if use_cache:
+        cube = update_aggregates(sheet_data, combined_df, cache_directory(read_columns(columns)))
+    else:
+        cube = build_cube(combined_df)
+    return cube, people_df
+
+def create_student_enrollment_charts(paths=None, workers=1, use_cache=True, readable_id=True, export_path=None,
+                                     output_path=DASHBOARD_FILE, output_mode='inline', gzip_output=False,
+                                     resolve_entities=True, stream=False, chunk_size=None, drilldown_dir=None,
+                                     from_db=None, sync_db=None, all_columns=False, validate=False,
+                                     validation_report=None, max_violations=0):
+    """
+    Create interactive bar charts for student enrollment analysis.
+    When export_path is given, the aggregation cube is also written there.
+    With resolve_entities, records of the same person are linked across courses
+    and workbooks and the unique people per year are shown in chart 1.
+    See load_aggregates for the streaming mode, the SQLite store and the
+    validation gate, which stops the run before any chart is drawn.
+
+    With drilldown_dir, a dashboard per year and per course is also written
+    there from the same aggregates (see drilldown.write_drilldown_dashboards).
+    """
+    cube, people_df = load_aggregates(paths, workers=workers, use_cache=use_cache, readable_id=readable_id,
+                                      resolve_entities=resolve_entities, stream=stream, chunk_size=chunk_size,
+                                      from_db=from_db, sync_db=sync_db, all_columns=all_columns,
+                                      validate=validate, validation_report=validation_report,
+                                      max_violations=max_violations)
+
+    if export_path:
+        export_cube(cube, export_path)
     
     # Create combined chart
-    create_combined_charts(combined_df)
+    people = count_people(people_df, by=['YEAR']) if people_df is not None else None
+    create_combined_charts(cube, output_path=output_path, output_mode=output_mode, gzip_output=gzip_output,
+                           people=people)
+
+    if drilldown_dir:
+        from drilldown import people_by_slice, write_drilldown_dashboards
+
+        write_drilldown_dashboards(cube, drilldown_dir,
+                                   people_by=people_by_slice(people_df) if people_df is not None else None,
+                                   workers=workers, output_mode=output_mode, gzip_output=gzip_output)
+
+def add_aggregate_arguments(parser):
+    """
+    Add the data loading options and the streaming options, shared by the
+    commands that build the aggregation cube
+    """
+    add_arguments(parser)
+    parser.add_argument('--stream', action='store_true',
+                        help='Read and clean the workbooks in chunks to bound memory use (ignores the sheet cache)')
+    parser.add_argument('--chunk-size', type=int, metavar='ROWS',
+                        help='Rows per chunk in --stream mode (default: 50000)')
+    parser.add_argument('--sync-db', metavar='PATH',
+                        help='Also upsert the cleaned records into the SQLite store at PATH (e.g. students.db)')
+    parser.add_argument('--from-db', metavar='PATH',
+                        help='Build the aggregates with SQL queries on the SQLite store at PATH instead of '
+                             'reading the inputs')
+    parser.add_argument('--all-columns', action='store_true',
+                        help='Read every column of the sheets, not only the ones the charts use')
+
+def main(argv=None):
+    """
+    Command line entry point: build the dashboard from the workbooks
+    """
+    parser = argparse.ArgumentParser(description="Generate the student enrollment dashboard")
+    add_aggregate_arguments(parser)
+    parser.add_argument('--export-cube', metavar='PATH',
+                        help='Also write the aggregation cube to PATH (.csv, .json or .parquet)')
+    parser.add_argument('--output', default=DASHBOARD_FILE, metavar='PATH',
+                        help=f'Dashboard HTML file (default: {DASHBOARD_FILE})')
+    parser.add_argument('--output-mode', choices=OUTPUT_MODES, default='inline',
+                        help="'inline' embeds plotly.js in the HTML; 'shared' writes it once to assets/ "
+                             "next to the HTML and minifies the figure")
+    parser.add_argument('--gzip', action='store_true', help='Also write pre-compressed .gz copies of the output')
+    parser.add_argument('--no-entity-resolution', action='store_true',
+                        help='Do not link records of the same person or show unique people in chart 1')
+    parser.add_argument('--drilldown', metavar='DIR', nargs='?', const='dashboards',
+                        help='Also write a dashboard per year and per course to DIR (default: dashboards), '
+                             'rendered with --workers processes; unchanged ones are skipped')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and rebuild the dashboard whenever the inputs change')
+    parser.add_argument('--poll-interval', type=float, default=1.0, metavar='SECONDS',
+                        help='Seconds between checks of the inputs in --watch mode (default: 1)')
+    parser.add_argument('--debounce', type=float, default=2.0, metavar='SECONDS',
+                        help='Seconds the inputs must stay unchanged before a rebuild in --watch mode (default: 2)')
+    parser.add_argument('--validate', action='store_true',
+                        help="Check the cleaned records against the validation rules first and stop before the "
+                             "charts when an 'error' rule fails")
+    parser.add_argument('--validation-report', metavar='PATH',
+                        help='With --validate, write the validation report to PATH (.csv or .json)')
+    parser.add_argument('--max-violations', type=int, default=0, metavar='ROWS',
+                        help="Rows an 'error' rule may break before --validate stops the run (default: 0)")
+    args = parser.parse_args(argv)
+    if args.watch and args.from_db:
+        parser.error('--watch rebuilds from the input files and cannot be combined with --from-db')
+    if args.validate and (args.stream or args.from_db):
+        parser.error('--validate needs the cleaned sheets and cannot be combined with --stream or --from-db')
+    instrumentation.start_run(args)
+
+    def build(paths):
+        create_student_enrollment_charts(paths, workers=args.workers, use_cache=not args.no_cache,
+                                         readable_id=not args.no_readable_id, export_path=args.export_cube,
+                                         output_path=args.output, output_mode=args.output_mode,
+                                         gzip_output=args.gzip, resolve_entities=not args.no_entity_resolution,
+                                         stream=args.stream, chunk_size=args.chunk_size,
+                                         drilldown_dir=args.drilldown, from_db=args.from_db, sync_db=args.sync_db,
+                                         all_columns=args.all_columns, validate=args.validate,
+                                         validation_report=args.validation_report,
+                                         max_violations=args.max_violations)
+
+    if args.watch:
+        from watch import watch
+
+        watch(build, args.files, args.inputs_file, interval=args.poll_interval, debounce=args.debounce)
+    elif args.validate:
+        from validation import ValidationFailed
+
+        try:
+            build(resolve_inputs(args.files, args.inputs_file))
+        except ValidationFailed as e:
+            logger.error("%s", e)
+            instrumentation.finish_run(args)
+            parser.exit(1)
+    else:
+        build(resolve_inputs(args.files, args.inputs_file))
+
+    instrumentation.finish_run(args)
 
 if __name__ == "__main__":
-    create_student_enrollment_charts() 
\ No newline at end of file
+    main()
@@ -0,0 +1,169 @@
+import contextlib
+import csv
+import json
+import logging
+import os
+import time
+import tracemalloc
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+LOG_FORMAT = '%(levelname)s %(name)s: %(message)s'
+
+# Columns of the run report, in order
+REPORT_FIELDS = ['stage', 'source', 'seconds', 'peak_memory_mb', 'rows_in', 'rows_out', 'pid']
+
+# Profiling state of this process. Stages are recorded only while enabled, so the
+# hooks cost nothing in normal runs.
+_enabled = False
+_started_tracemalloc = False
+_records = []
+_stack = []
+
+
+def configure_logging(level='INFO'):
+    """
+    Send log records of all pipeline modules to stderr at the given level
+    """
+    logging.basicConfig(level=getattr(logging, str(level).upper()), format=LOG_FORMAT)
+    # pandas warnings (e.g. SettingWithCopyWarning) go through the same handler and level
+    logging.captureWarnings(True)
+
+
+def enable_profiling(enabled=True):
+    """
+    Switch stage profiling on or off. Memory is measured with tracemalloc,
+    which slows the pipeline down while it is on.
+    """
+    global _enabled, _started_tracemalloc
+    _enabled = enabled
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    elif not enabled and _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def profiling_enabled():
+    return _enabled
+
+
+@contextlib.contextmanager
+def stage(name, source=None, rows_in=None):
+    """
+    Profile one pipeline stage: wall time, peak traced memory above the memory in
+    use when the stage started, rows in and out, and the sheet or file processed.
+
+    Yields the record being built; set record['rows_out'] inside the block.
+    Nested stages are recorded separately and also count towards their parent.
+    """
+    record = {'stage': name, 'source': source, 'rows_in': rows_in, 'rows_out': None}
+    if not _enabled:
+        yield record
+        return
+
+    if _stack:
+        # reset_peak() below would lose the parent's peak so far
+        parent = _stack[-1]
+        parent['_peak'] = max(parent['_peak'], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    record['_base'] = tracemalloc.get_traced_memory()[0]
+    record['_peak'] = record['_base']
+    _stack.append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        _stack.pop()
+        peak = max(record.pop('_peak'), tracemalloc.get_traced_memory()[1])
+        base = record.pop('_base')
+        if _stack:
+            _stack[-1]['_peak'] = max(_stack[-1]['_peak'], peak)
+        record.update(seconds=round(seconds, 6), peak_memory_mb=round((peak - base) / 2 ** 20, 3), pid=os.getpid())
+        _records.append(record)
+        logger.debug("%s %s: %.3f s, %.1f MB peak", name, source or '', seconds, record['peak_memory_mb'])
+
+
+def run_stage(func, df, *args, source=None, **kwargs):
+    """
+    Call func(df, *args, **kwargs) as a profiled stage named after the function
+    and return its result, a DataFrame
+    """
+    with stage(func.__name__, source=source, rows_in=len(df)) as record:
+        result = func(df, *args, **kwargs)
+        record['rows_out'] = len(result)
+    return result
+
+
+def take_records():
+    """
+    Return and clear the stages recorded in this process, e.g. to send them
+    from a worker process back to the parent
+    """
+    records = list(_records)
+    _records.clear()
+    return records
+
+
+def add_records(records):
+    """
+    Add stages recorded in another process to this process's report
+    """
+    if _enabled:
+        _records.extend(records)
+
+
+def write_report(path):
+    """
+    Write the recorded stages as CSV (.csv) or JSON (anything else) and return them
+    """
+    records = list(_records)
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        totals = {}
+        for record in records:
+            total = totals.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0, 'peak_memory_mb': 0.0})
+            total['calls'] += 1
+            total['seconds'] = round(total['seconds'] + record['seconds'], 6)
+            total['peak_memory_mb'] = max(total['peak_memory_mb'], record['peak_memory_mb'])
+        report = {'created': datetime.now().isoformat(timespec='seconds'), 'stages': records, 'totals': totals}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    logger.info("Run report with %d stages written to '%s'", len(records), path)
+    return records
+
+
+def add_arguments(parser):
+    """
+    Logging and profiling options shared by the command line entry points
+    """
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default='INFO',
+                        help='Logging verbosity (default: INFO; WARNING for quiet runs)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record time, peak memory and rows of every pipeline stage')
+    parser.add_argument('--report', metavar='PATH', default='run_report.json',
+                        help='Where --profile writes its run report, .json or .csv (default: run_report.json)')
+
+
+def start_run(args):
+    """
+    Apply the options added by add_arguments
+    """
+    configure_logging(args.log_level)
+    enable_profiling(args.profile)
+
+
+def finish_run(args):
+    """
+    Write the run report if profiling was requested
+    """
+    if args.profile:
+        write_report(args.report)
@@ -0,0 +1,164 @@
+import argparse
+import logging
+import sys
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from entity_resolution import _normalize_unique, normalize_mobile, normalize_name
+from extract_excel_data import add_arguments, combine_sheets, load_sheet_data, resolve_inputs
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# Exact-match indexes: lookup field -> column of the combined records
+EXACT_FIELDS = {'adm_no': 'ADM_NO', 'mobile': 'MOBILE', 'unique_id': 'UNIQUE_ID'}
+
+# Columns shown by the lookup command
+DISPLAY_COLUMNS = ['ADM_NO', 'STUDENT', 'FATHER_HUSBAND', 'COURSE', 'DURATION', 'YEAR', 'MOBILE', 'EMAIL',
+                   'PRESENT_STATUS']
+
+
+def normalize_adm_no(series):
+    """
+    Admission numbers as upper-case strings without surrounding spaces or the
+    '.0' of numbers read as floats, so 101, 101.0 and ' 101 ' are the same key
+    """
+    return _normalize_unique(series, lambda values: values.str.strip().str.upper()
+                             .str.replace(r'^(\d+)\.0$', r'\1', regex=True))
+
+
+# How each exact field and a query value are normalized before comparing
+NORMALIZERS = {'adm_no': normalize_adm_no, 'mobile': normalize_mobile, 'unique_id': lambda series: series.astype(object)}
+
+
+def _hash_index(keys):
+    """
+    Dict of key -> array of row positions, built in one groupby pass
+    """
+    return pd.Series(np.arange(len(keys))).groupby(keys.to_numpy(), sort=False).indices
+
+
+def build_index(df):
+    """
+    Build the lookup indexes over the combined records:
+    - hash indexes on normalized ADM_NO, MOBILE and UNIQUE_ID for exact lookup
+    - a prefix index on STUDENT: the sorted (name, row) entries of every
+      normalized name and of each of its later words, so 'pri' finds
+      'Priya Sharma' and 'sha' finds her too
+
+    Returns a dict holding the records and the indexes.
+    """
+    with stage('build_lookup_index', rows_in=len(df)) as record:
+        records = df.reset_index(drop=True)
+        index = {'records': records}
+        for field, column in EXACT_FIELDS.items():
+            if column in records.columns:
+                index[field] = _hash_index(NORMALIZERS[field](records[column]))
+            else:
+                logger.warning("No %s column, lookups by %s are not available", column, field)
+
+        names, rows = [], []
+        if 'STUDENT' in records.columns:
+            for row, name in enumerate(normalize_name(records['STUDENT'])):
+                if not name:
+                    continue
+                words = name.split()
+                for i in range(len(words)):
+                    names.append(' '.join(words[i:]))
+                    rows.append(row)
+        order = sorted(range(len(names)), key=names.__getitem__)
+        index['names'] = [names[i] for i in order]
+        index['name_rows'] = [rows[i] for i in order]
+        record['rows_out'] = len(index['names'])
+    return index
+
+
+def lookup(index, field, value):
+    """
+    Records whose `field` ('adm_no', 'mobile' or 'unique_id') equals value after
+    normalization, e.g. lookup(index, 'mobile', '+91 98100 12345'). One hash
+    lookup, independent of the number of records.
+    """
+    if field not in EXACT_FIELDS:
+        raise ValueError(f"Unknown lookup field {field!r}, expected one of {sorted(EXACT_FIELDS)}")
+    if field not in index:
+        raise KeyError(f"The records have no {EXACT_FIELDS[field]} column")
+    key = NORMALIZERS[field](pd.Series([value], dtype=object)).iloc[0]
+    rows = index[field].get(key, []) if key is not None else []
+    return index['records'].iloc[rows]
+
+
+def search_name(index, prefix, limit=None):
+    """
+    Records whose student name, or a later word of it, starts with prefix
+    (compared after normalize_name), in name order. Two binary searches find
+    the matching range of the sorted prefix index.
+    """
+    prefix = normalize_name(pd.Series([prefix], dtype=object)).iloc[0]
+    if not prefix:
+        return index['records'].iloc[[]]
+    names = index['names']
+    start = bisect_left(names, prefix)
+    # Every string starting with prefix sorts before prefix + the highest code point
+    end = bisect_left(names, prefix + '\U0010ffff', lo=start)
+    rows = list(dict.fromkeys(index['name_rows'][start:end]))
+    return index['records'].iloc[rows[:limit]]
+
+
+def load_records(paths=None, workers=1, use_cache=True, readable_id=True, columns=None):
+    """
+    The combined, cleaned records of the inputs, with a YEAR. With columns,
+    the other columns of the sheets are not read (see load_sheet_data).
+    """
+    sheet_data = load_sheet_data(paths, workers=workers, use_cache=use_cache, readable_id=readable_id,
+                                 columns=columns)
+    combined_df = combine_sheets(sheet_data)
+    return combined_df.dropna(subset=['YEAR'])
+
+
+def main(argv=None):
+    """
+    Command line entry point: find students by admission number, mobile,
+    unique ID or name prefix
+    """
+    parser = argparse.ArgumentParser(description="Look up students in the combined records")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument('--adm-no', help='Exact admission number')
+    query.add_argument('--mobile', help='Mobile number in any format (+91, spaces, leading 0)')
+    query.add_argument('--unique-id', help='Exact UNIQUE_ID')
+    query.add_argument('--name', help='Prefix of the student name or of one of its later words')
+    parser.add_argument('--limit', type=int, default=50, help='Maximum records shown for --name (default: 50)')
+    parser.add_argument('--format', choices=['table', 'csv', 'json'], default='table', help='Output format')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.unique_id is not None and args.no_readable_id:
+        parser.error('--unique-id looks up the readable UNIQUE_ID and cannot be combined with --no-readable-id')
+    instrumentation.start_run(args)
+
+    records = load_records(resolve_inputs(args.files, args.inputs_file), workers=args.workers,
+                           use_cache=not args.no_cache, readable_id=not args.no_readable_id,
+                           columns=list(EXACT_FIELDS.values()) + DISPLAY_COLUMNS)
+    index = build_index(records)
+    if args.name is not None:
+        result = search_name(index, args.name, limit=args.limit)
+    else:
+        field = next(field for field in EXACT_FIELDS if getattr(args, field) is not None)
+        result = lookup(index, field, getattr(args, field))
+
+    result = result[[column for column in DISPLAY_COLUMNS if column in result.columns]]
+    logger.info("%d matching records", len(result))
+    if args.format == 'csv':
+        result.to_csv(sys.stdout, index=False)
+    elif args.format == 'json':
+        print(result.to_json(orient='records', indent=2, default_handler=str))
+    elif len(result):
+        print(result.to_string(index=False))
+
+    instrumentation.finish_run(args)
+
+
+if __name__ == "__main__":
+    main()
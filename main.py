@@ -0,0 +1,39 @@
+"""
+Command line entry point for the student enrollment analysis.
+
+    python main.py                      Build the dashboard (same as `dashboard`)
+    python main.py dashboard [options]  Build student_enrollment_dashboard.html
+    python main.py extract [options]    Read and clean the workbooks only
+    python main.py serve [options]      Serve the chart aggregates as JSON on localhost
+    python main.py lookup [options]     Find students by ADM_NO, mobile, UNIQUE_ID or name
+    python main.py sync [options]       Upsert the cleaned records into the SQLite store
+    python main.py validate [options]   Check the cleaned records and write a data-quality report
+"""
+import sys
+
+# Each command module is imported only when it is run
+COMMANDS = {
+    'dashboard': 'generate_charts',
+    'extract': 'extract_excel_data',
+    'serve': 'server',
+    'lookup': 'lookup',
+    'sync': 'store',
+    'validate': 'validation',
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in ('-h', '--help'):
+        print(__doc__.strip())
+        return
+    command = 'dashboard'
+    if argv and argv[0] in COMMANDS:
+        command, argv = argv[0], argv[1:]
+
+    module = __import__(COMMANDS[command])
+    module.main(argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Local server for the aggregates behind the dashboard charts, as JSON.
+
+    python main.py serve --port 8050
+
+    GET /api/charts                          chart names and the values of every filter
+    GET /api/charts/<chart>?year=2023-2024   one chart's counts
+    GET /api/dashboard?course=Tally,DTP      the counts of all ten charts
+
+Filters: year, course, gender and present_status. Repeat a filter or separate
+values with commas to match any of them; URL-encode '+' in course names as %2B.
+The income charts are per year and course and ignore the other filters.
+"""
+import argparse
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import instrumentation
+from extract_excel_data import resolve_inputs
+from generate_charts import CHARTS, add_aggregate_arguments, chart_aggregates, load_aggregates
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8050
+
+# Query parameters of the chart endpoints and the cube dimension each one filters
+FILTERS = {'year': 'YEAR', 'course': 'COURSE', 'gender': 'GENDER', 'present_status': 'PRESENT_STATUS'}
+
+# Distinct (chart, filters) responses kept in memory
+CACHE_SIZE = 1024
+
+
+def parse_filters(query):
+    """
+    The filters of a query string as a hashable, canonical tuple of
+    (dimension, values) pairs, so equivalent queries share a cache entry.
+    Raises ValueError for unknown parameters.
+    """
+    where = {}
+    for key, values in parse_qs(query).items():
+        if key not in FILTERS:
+            raise ValueError(f"Unknown filter {key!r}, expected one of {sorted(FILTERS)}")
+        items = {item.strip() for value in values for item in value.split(',') if item.strip()}
+        where[FILTERS[key]] = tuple(sorted(items))
+    return tuple(sorted(where.items()))
+
+
+def _json_body(payload):
+    return json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def make_responder(cube, cache_size=CACHE_SIZE):
+    """
+    Memoized function (chart or None for all charts, filters) -> (JSON body, ETag).
+    Each distinct request is computed from the cube once; repeats are served
+    from an LRU cache.
+    """
+    names = {dimension: parameter for parameter, dimension in FILTERS.items()}
+
+    @lru_cache(maxsize=cache_size)
+    def respond(chart, filters):
+        data = chart_aggregates(cube, where=dict(filters), charts=[chart] if chart else None)
+        payload = {
+            'filters': {names[dimension]: list(values) for dimension, values in filters},
+            'charts': {name: table.to_dict(orient='records') for name, table in data.items()},
+        }
+        body = _json_body(payload)
+        return body, _etag(body)
+
+    return respond
+
+
+def chart_index(cube):
+    """
+    JSON body listing the chart names and the values each filter accepts
+    """
+    counts = cube['counts']
+    values = {parameter: sorted(str(value) for value in counts[dimension].dropna().unique())
+              for parameter, dimension in FILTERS.items()}
+    body = _json_body({'charts': CHARTS, 'filters': values})
+    return body, _etag(body)
+
+
+class ChartRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET handler for the JSON endpoints; the data comes from server.respond
+    and server.index (see make_server)
+    """
+    server_version = 'StudentDashboard/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/')
+        try:
+            filters = parse_filters(url.query)
+        except ValueError as e:
+            return self._send_json(HTTPStatus.BAD_REQUEST, _json_body({'error': str(e)}))
+
+        if path == '/api/charts':
+            body, etag = self.server.index
+        elif path == '/api/dashboard':
+            body, etag = self.server.respond(None, filters)
+        elif path.startswith('/api/charts/') and path[len('/api/charts/'):] in CHARTS:
+            body, etag = self.server.respond(path[len('/api/charts/'):], filters)
+        else:
+            return self._send_json(HTTPStatus.NOT_FOUND, _json_body({'error': f'Not found: {url.path}'}))
+
+        if etag in self._if_none_match():
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self._send_json(HTTPStatus.OK, body, etag)
+
+    def _if_none_match(self):
+        header = self.headers.get('If-None-Match', '')
+        return {tag.strip().removeprefix('W/') for tag in header.split(',') if tag.strip()}
+
+    def _send_json(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            # Clients may keep responses but must revalidate them, which costs a 304
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+
+def make_server(cube, host=DEFAULT_HOST, port=DEFAULT_PORT, cache_size=CACHE_SIZE):
+    """
+    A threading HTTP server answering the JSON endpoints from the given cube
+    """
+    server = ThreadingHTTPServer((host, port), ChartRequestHandler)
+    server.daemon_threads = True
+    server.respond = make_responder(cube, cache_size)
+    server.index = chart_index(cube)
+    return server
+
+
+def main(argv=None):
+    """
+    Command line entry point: load the data once and serve its aggregates
+    """
+    parser = argparse.ArgumentParser(description="Serve the dashboard aggregates as JSON")
+    add_aggregate_arguments(parser)
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Address to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                        help=f'Responses kept in the LRU cache (default: {CACHE_SIZE})')
+    args = parser.parse_args(argv)
+    instrumentation.start_run(args)
+
+    # The charts served here only need the cube; people are not resolved
+    cube, _ = load_aggregates(resolve_inputs(args.files, args.inputs_file), workers=args.workers,
+                              use_cache=not args.no_cache, readable_id=not args.no_readable_id,
+                              resolve_entities=False, stream=args.stream, chunk_size=args.chunk_size,
+                              from_db=args.from_db, sync_db=args.sync_db, all_columns=args.all_columns)
+    instrumentation.finish_run(args)
+
+    server = make_server(cube, args.host, args.port, args.cache_size)
+    logger.info("Serving the dashboard aggregates on http://%s:%d/api/charts", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the cached sheets, the workbook fingerprint index and the manifest
+CACHE_DIR = '.sheet_cache'
+INDEX_FILE = 'index.json'
+MANIFEST_FILE = 'manifest.json'
+
+# Bump whenever the cleaning stages change their output so old entries are ignored
+CACHE_VERSION = 5
+
+# pyarrow is optional and only imported when a sheet is written as Parquet
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+def _load_json(cache_dir, file_name):
+    """
+    Load a JSON file from the cache directory, or an empty dict if it is missing or corrupt
+    """
+    path = os.path.join(cache_dir, file_name)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_json(data, cache_dir, file_name):
+    """
+    Atomically write a JSON file to the cache directory
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, file_name)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _hash_file(path, chunk_size=1 << 20):
+    """
+    SHA-256 of the file contents, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def workbook_fingerprint(path, cache_dir=CACHE_DIR):
+    """
+    Fingerprint a workbook by path, size, mtime and content hash.
+
+    The content hash is only recomputed when size or mtime changed since the
+    last run.
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    index = _load_json(cache_dir, INDEX_FILE)
+    entry = index.get(abs_path)
+
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry
+
+    with stage('hash_workbook', source=path):
+        sha256 = _hash_file(abs_path)
+    if entry and entry['sha256'] == sha256:
+        # Touched but not modified, keep the remembered sheet names
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    else:
+        entry = {
+            'path': abs_path,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256,
+            'sheets': None,
+        }
+    index[abs_path] = entry
+    _save_json(index, cache_dir, INDEX_FILE)
+    return entry
+
+
+def remember_sheet_names(fingerprint, sheet_names, cache_dir=CACHE_DIR):
+    """
+    Store the sheet names of a workbook so unchanged files are never opened
+    """
+    index = _load_json(cache_dir, INDEX_FILE)
+    entry = index.get(fingerprint['path'], fingerprint)
+    entry['sheets'] = list(sheet_names)
+    fingerprint['sheets'] = list(sheet_names)
+    index[fingerprint['path']] = entry
+    _save_json(index, cache_dir, INDEX_FILE)
+
+
+def frame_fingerprint(df):
+    """
+    Content hash of a DataFrame: column names, dtypes and every value
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode('utf-8'))
+    if len(df.columns):
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def load_manifest(cache_dir=CACHE_DIR):
+    """
+    Load the processing manifest.
+
+    For every workbook it records the content hash it was last processed at,
+    and for each of its sheets the fingerprints of the raw and processed data:
+    {path: {'sha256': ..., 'sheets': {sheet: {'raw': ..., 'processed': ..., 'rows': ...}}}}
+    """
+    return _load_json(cache_dir, MANIFEST_FILE)
+
+
+def save_manifest(manifest, cache_dir=CACHE_DIR):
+    """
+    Atomically write the processing manifest
+    """
+    _save_json(manifest, cache_dir, MANIFEST_FILE)
+
+
+def _entry_name(path, sheet_name, raw_fingerprint, settings=''):
+    """
+    Cache file name (without extension) of the cleaned version of one raw sheet.
+    `settings` identifies configuration that changes the cleaned output.
+    """
+    key = '\0'.join([os.path.abspath(path), sheet_name, raw_fingerprint, str(CACHE_VERSION), settings])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def load_cached_sheet(path, sheet_name, raw_fingerprint, settings='', cache_dir=CACHE_DIR):
+    """
+    Return the cached cleaned DataFrame of a raw sheet, or None on a cache miss
+    """
+    name = _entry_name(path, sheet_name, raw_fingerprint, settings)
+    parquet_path = os.path.join(cache_dir, name + '.parquet')
+    pickle_path = os.path.join(cache_dir, name + '.pkl')
+    df = None
+    with stage('load_cached_sheet', source=f"{path}:{sheet_name}") as record:
+        try:
+            if HAS_PYARROW and os.path.exists(parquet_path):
+                df = pd.read_parquet(parquet_path)
+                # Parquet hands missing values in object columns back as None
+                object_columns = df.columns[df.dtypes == object]
+                if len(object_columns):
+                    df[object_columns] = df[object_columns].fillna(np.nan)
+            elif os.path.exists(pickle_path):
+                df = pd.read_pickle(pickle_path)
+        except (OSError, ValueError, pickle.UnpicklingError) as e:
+            logger.warning("Ignoring unreadable cache entry for %s: %s", sheet_name, e)
+            df = None
+        record['rows_out'] = None if df is None else len(df)
+    return df
+
+
+def store_cached_sheet(path, sheet_name, raw_fingerprint, df, settings='', cache_dir=CACHE_DIR):
+    """
+    Write the cleaned DataFrame of a raw sheet to the cache.
+
+    Parquet is used when pyarrow is installed. Sheets whose free-text columns
+    mix numbers and strings cannot be stored as Parquet and fall back to pickle.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    name = _entry_name(path, sheet_name, raw_fingerprint, settings)
+    with stage('store_cached_sheet', source=f"{path}:{sheet_name}", rows_in=len(df)):
+        if HAS_PYARROW:
+            import pyarrow
+
+            parquet_path = os.path.join(cache_dir, name + '.parquet')
+            try:
+                df.to_parquet(parquet_path, index=False)
+                return
+            except (pyarrow.ArrowException, ValueError, TypeError):
+                if os.path.exists(parquet_path):
+                    os.remove(parquet_path)
+        df.to_pickle(os.path.join(cache_dir, name + '.pkl'))
+
+
+def prune_cache(manifest, settings='', cache_dir=CACHE_DIR):
+    """
+    Delete cached sheets that no longer belong to any sheet in the manifest
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    keep = set()
+    for path, workbook in manifest.items():
+        for sheet_name, sheet in workbook.get('sheets', {}).items():
+            keep.add(_entry_name(path, sheet_name, sheet['raw'], settings))
+    for file_name in os.listdir(cache_dir):
+        name, ext = os.path.splitext(file_name)
+        # Only sheet entries are named by a 64 character hash
+        if ext in ('.parquet', '.pkl') and len(name) == 64 and name not in keep:
+            try:
+                os.remove(os.path.join(cache_dir, file_name))
+            except OSError:
+                pass
@@ -0,0 +1,210 @@
+import argparse
+import logging
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from aggregates import CUBE_DIMENSIONS, build_income_tables
+from extract_excel_data import (KEY_COLUMN, add_arguments, create_unique_identifier, load_sheet_data, parse_income,
+                                resolve_inputs)
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+DATABASE_FILE = 'students.db'
+
+# Columns of the records table, after the UNIQUE_ID primary key
+RECORD_COLUMNS = ['SOURCE', KEY_COLUMN, 'S_NO', 'ADM_NO', 'STUDENT', 'FATHER_HUSBAND', 'COURSE', 'DURATION',
+                  'ADDRESS', 'MOBILE', 'EMAIL', 'EDUCATION', 'CURRENT_STATUS', 'MONTHLY_INCOME', 'YEAR', 'GENDER',
+                  'EMPLOYMENT_STATUS', 'PRESENT_STATUS']
+
+# Indexed columns, the ones dashboards and ad-hoc questions filter on
+INDEXED_COLUMNS = ['YEAR', 'COURSE', 'GENDER', 'PRESENT_STATUS']
+
+# Rows per executemany call
+BATCH_SIZE = 10_000
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS records (UNIQUE_ID TEXT PRIMARY KEY, '
+    + ', '.join(f'{column} INTEGER' if column == KEY_COLUMN else f'{column} TEXT' for column in RECORD_COLUMNS)
+    + ')',
+    # What every stored sheet was built from, so unchanged sheets are skipped, and its workbook
+    'CREATE TABLE IF NOT EXISTS sources (SOURCE TEXT PRIMARY KEY, FINGERPRINT TEXT, ROWS INTEGER, FILE TEXT)',
+    'CREATE INDEX IF NOT EXISTS idx_records_source ON records (SOURCE)',
+] + [f'CREATE INDEX IF NOT EXISTS idx_records_{column.lower()} ON records ({column})' for column in INDEXED_COLUMNS]
+
+
+def connect(path=DATABASE_FILE):
+    """
+    Open the database in WAL mode, so dashboards and lookups can read it while
+    a sync writes, and create the tables and indexes if needed
+    """
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        # Databases created before sources recorded the workbook of each sheet
+        if 'FILE' not in [row[1] for row in conn.execute('PRAGMA table_info(sources)')]:
+            conn.execute('ALTER TABLE sources ADD COLUMN FILE TEXT')
+    return conn
+
+
+def _record_rows(df, source):
+    """
+    Tuples of (UNIQUE_ID, *RECORD_COLUMNS) for executemany, with missing values as NULL
+    """
+    if 'UNIQUE_ID' not in df.columns:
+        df = create_unique_identifier(df.copy(), readable_id=True)
+        if 'UNIQUE_ID' not in df.columns:
+            # A sheet without the ID columns (e.g. notes) holds no records
+            return []
+    columns = {'UNIQUE_ID': df['UNIQUE_ID'], 'SOURCE': pd.Series(source, index=df.index)}
+    for column in RECORD_COLUMNS[1:]:
+        if column not in df.columns:
+            columns[column] = pd.Series(None, index=df.index, dtype=object)
+        elif column == KEY_COLUMN:
+            columns[column] = df[column].astype(object).where(df[column].notna(), None)
+        else:
+            values = df[column].astype(object)
+            columns[column] = values.map(str).where(values.notna(), None)
+    table = pd.DataFrame(columns)
+    table = table[table['UNIQUE_ID'].notna()]
+    return list(table.itertuples(index=False, name=None))
+
+
+def _upsert_statement():
+    columns = ['UNIQUE_ID'] + RECORD_COLUMNS
+    updates = ', '.join(f'{column} = excluded.{column}' for column in RECORD_COLUMNS)
+    return (f"INSERT INTO records ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (UNIQUE_ID) DO UPDATE SET {updates}")
+
+
+def _source_files(sources, files):
+    """
+    The workbook of every "<file>_<sheet>" source among `files`, the longest
+    matching path winning. Sources of none of them are left out.
+    """
+    source_files = {}
+    for source in sources:
+        matches = [file for file in files if source.startswith(f'{file}_')]
+        if matches:
+            source_files[source] = max(matches, key=len)
+    return source_files
+
+
+def sync_sheets(sheet_data, path=DATABASE_FILE, files=None):
+    """
+    Upsert the cleaned records of every sheet into the database, keyed by UNIQUE_ID.
+
+    Sheets whose df.attrs['fingerprint'] matches the stored one are skipped.
+    The records of a changed sheet replace its previous records. `files` are
+    the workbooks sheet_data was read from: stored sheets of those workbooks
+    that were loaded this time but no longer have the sheet are deleted.
+    Sheets of other workbooks, e.g. ones synced by an earlier run with other
+    inputs or ones that could not be read, are kept. Without files nothing
+    is deleted. Everything happens in one transaction, in executemany
+    batches of BATCH_SIZE rows.
+    """
+    source_files = _source_files(sheet_data, files or [])
+    loaded_files = set(source_files.values())
+    conn = connect(path)
+    try:
+        stored = {source: (fingerprint, file) for source, fingerprint, file
+                  in conn.execute('SELECT SOURCE, FINGERPRINT, FILE FROM sources')}
+        statement = _upsert_statement()
+        written = skipped = 0
+        with stage('sync_store', source=path, rows_in=sum(len(df) for df in sheet_data.values())) as record, conn:
+            for source, (_, file) in stored.items():
+                if file in loaded_files and source not in sheet_data:
+                    conn.execute('DELETE FROM records WHERE SOURCE = ?', (source,))
+                    conn.execute('DELETE FROM sources WHERE SOURCE = ?', (source,))
+            for source, df in sheet_data.items():
+                fingerprint = df.attrs.get('fingerprint')
+                file = source_files.get(source)
+                if fingerprint is not None and stored.get(source, (None,))[0] == fingerprint:
+                    if file is not None and stored[source][1] != file:
+                        conn.execute('UPDATE sources SET FILE = ? WHERE SOURCE = ?', (file, source))
+                    skipped += 1
+                    continue
+                conn.execute('DELETE FROM records WHERE SOURCE = ?', (source,))
+                rows = _record_rows(df, source)
+                for start in range(0, len(rows), BATCH_SIZE):
+                    conn.executemany(statement, rows[start:start + BATCH_SIZE])
+                conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                             (source, fingerprint, len(rows), file))
+                written += len(rows)
+            record['rows_out'] = written
+        total = conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+    finally:
+        conn.close()
+    logger.info("Store '%s': %d records written from %d sheets, %d sheets unchanged, %d records in total",
+                path, written, len(sheet_data) - skipped, skipped, total)
+
+
+def load_cube(path=DATABASE_FILE):
+    """
+    The aggregation cube (see aggregates.build_cube) computed by SQL queries on
+    the database instead of from a combined DataFrame. The income tables are
+    built from the distinct (YEAR, COURSE, STUDENT_KEY, MONTHLY_INCOME) rows.
+    """
+    dimensions = ', '.join(CUBE_DIMENSIONS)
+    cells = (f'SELECT DISTINCT {dimensions}, {KEY_COLUMN} FROM records '
+             f'WHERE {KEY_COLUMN} IS NOT NULL AND YEAR IS NOT NULL')
+    conn = connect(path)
+    try:
+        with stage('load_cube_sql', source=path) as record:
+            counts = pd.read_sql_query(
+                f'SELECT {dimensions}, COUNT(DISTINCT {KEY_COLUMN}) AS STUDENTS FROM records '
+                f'WHERE {KEY_COLUMN} IS NOT NULL AND YEAR IS NOT NULL '
+                f'GROUP BY {dimensions} ORDER BY {dimensions}', conn)
+            overlaps = pd.read_sql_query(
+                f'WITH cells AS ({cells}) SELECT * FROM cells WHERE {KEY_COLUMN} IN '
+                f'(SELECT {KEY_COLUMN} FROM cells GROUP BY {KEY_COLUMN} HAVING COUNT(*) > 1)', conn)
+            incomes = pd.read_sql_query(
+                f'SELECT DISTINCT YEAR, COURSE, {KEY_COLUMN}, MONTHLY_INCOME FROM records '
+                f'WHERE {KEY_COLUMN} IS NOT NULL AND YEAR IS NOT NULL', conn)
+            record['rows_out'] = len(counts)
+    finally:
+        conn.close()
+    counts['STUDENTS'] = counts['STUDENTS'].astype(np.int64)
+    overlaps[KEY_COLUMN] = overlaps[KEY_COLUMN].astype(np.int64)
+    incomes['INCOME'] = parse_income(incomes['MONTHLY_INCOME'])
+    return {'counts': counts, 'overlaps': overlaps, **build_income_tables(incomes)}
+
+
+def load_profiles(path=DATABASE_FILE):
+    """
+    The YEAR, COURSE and person columns of every stored record, for entity resolution
+    """
+    conn = connect(path)
+    try:
+        return pd.read_sql_query('SELECT YEAR, COURSE, STUDENT, FATHER_HUSBAND, MOBILE, EMAIL FROM records '
+                                 'WHERE YEAR IS NOT NULL', conn)
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    """
+    Command line entry point: read and clean the inputs and sync them into the database
+    """
+    parser = argparse.ArgumentParser(description="Sync the cleaned records into the SQLite store")
+    parser.add_argument('--db', default=DATABASE_FILE, help=f'SQLite database file (default: {DATABASE_FILE})')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start_run(args)
+
+    paths = resolve_inputs(args.files, args.inputs_file)
+    sheet_data = load_sheet_data(paths, workers=args.workers, use_cache=not args.no_cache,
+                                 readable_id=not args.no_readable_id)
+    sync_sheets(sheet_data, args.db, files=paths)
+
+    instrumentation.finish_run(args)
+
+
+if __name__ == "__main__":
+    main()
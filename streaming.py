@@ -0,0 +1,220 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from aggregates import CUBE_DIMENSIONS, build_cube
+from entity_resolution import MATCH_COLUMNS, PERSON_COLUMN, PROFILE_FIELDS, normalize_profiles, resolve_people
+from extract_excel_data import (KEY_COLUMN, column_filter, excel_files, extract_year_from_sheet, process_sheet,
+                                read_columns)
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# Columns every chunk needs for the cube and its income tables
+CELL_COLUMNS = CUBE_DIMENSIONS + [KEY_COLUMN, 'INCOME']
+
+# Columns kept per distinct person profile for entity resolution: the partition
+# and the normalized profile fields
+PROFILE_COLUMNS = ['YEAR', 'COURSE'] + PROFILE_FIELDS
+
+# Pending rows are merged into the distinct ones once there are more of them
+# than distinct rows, and at least this many
+MIN_MERGE_ROWS = 100_000
+
+
+def _as_object(df):
+    # Chunks have their own categories; plain values concatenate without recoding
+    return df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+
+
+class CellAccumulator:
+    """
+    The distinct (cube cell, STUDENT_KEY) pairs of every chunk added, kept as
+    numpy arrays: the key, a code for the cell's CUBE_DIMENSIONS values, the
+    highest INCOME and the number of records of each pair, about 24 bytes per
+    pair. Cells are coded in a dict of their values, which stays small.
+
+    New pairs are collected and merged into the distinct ones (sort and
+    reduce) only when they outnumber them, so each pair is merged a
+    logarithmic number of times instead of once per chunk.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.keys = np.empty(0, dtype=np.int64)
+        self.codes = np.empty(0, dtype=np.int32)
+        self.incomes = np.empty(0, dtype=np.float64)
+        self.records = np.empty(0, dtype=np.int64)
+        self.pending = []
+        self.pending_rows = 0
+
+    def _cell_codes(self, df):
+        """
+        Code of the cell of every row of df, adding the cells not seen before
+        """
+        groups = df.groupby(CUBE_DIMENSIONS, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+        _, first = np.unique(groups, return_index=True)
+        combinations = _as_object(df[CUBE_DIMENSIONS].iloc[first])
+        combinations = combinations.where(combinations.notna(), None)
+        codes = np.array([self.cells.setdefault(cell, len(self.cells))
+                          for cell in combinations.itertuples(index=False, name=None)], dtype=np.int32)
+        return codes[groups]
+
+    def add(self, df):
+        """
+        Fold the rows of a cleaned chunk with a STUDENT_KEY into the pairs
+        """
+        df = df[df[KEY_COLUMN].notna()]
+        if df.empty:
+            return
+        self.pending.append((df[KEY_COLUMN].to_numpy(dtype=np.int64), self._cell_codes(df),
+                             df['INCOME'].to_numpy(dtype=np.float64, na_value=np.nan),
+                             np.ones(len(df), dtype=np.int64)))
+        self.pending_rows += len(df)
+        if self.pending_rows >= max(len(self.keys), MIN_MERGE_ROWS):
+            self.merge()
+
+    def merge(self):
+        """
+        Merge the pending pairs into the distinct ones
+        """
+        if not self.pending:
+            return
+        parts = [(self.keys, self.codes, self.incomes, self.records)] + self.pending
+        keys, codes, incomes, records = (np.concatenate(column) for column in zip(*parts))
+        self.pending, self.pending_rows = [], 0
+        order = np.lexsort((codes, keys))
+        keys, codes, incomes, records = keys[order], codes[order], incomes[order], records[order]
+        starts = np.flatnonzero(np.r_[True, (np.diff(keys) != 0) | (np.diff(codes) != 0)])
+        self.keys, self.codes = keys[starts], codes[starts]
+        # fmax ignores missing incomes unless all of a pair's are missing
+        self.incomes = np.fmax.reduceat(incomes, starts)
+        self.records = np.add.reduceat(records, starts)
+
+    def duplicate_count(self):
+        """
+        Records whose STUDENT_KEY is shared with another record, as in check_combination_uniqueness
+        """
+        self.merge()
+        if not len(self.keys):
+            return 0
+        starts = np.flatnonzero(np.r_[True, np.diff(self.keys) != 0])
+        per_key = np.add.reduceat(self.records, starts)
+        return int(per_key[per_key > 1].sum())
+
+    def frame(self):
+        """
+        The distinct pairs as a frame of CELL_COLUMNS, with categorical dimensions
+        """
+        self.merge()
+        cells = pd.DataFrame(list(self.cells), columns=CUBE_DIMENSIONS, dtype=object)
+        columns = {}
+        for column in CUBE_DIMENSIONS:
+            values = cells[column]
+            categories = pd.Index(sorted(values.dropna().unique()), dtype=object)
+            columns[column] = pd.Categorical.from_codes(categories.get_indexer(values)[self.codes],
+                                                        categories=categories)
+        columns[KEY_COLUMN] = self.keys
+        columns['INCOME'] = self.incomes
+        return pd.DataFrame(columns, columns=CELL_COLUMNS)
+
+
+def _merge_profiles(profiles, pending):
+    """
+    Distinct rows of the accumulated profiles and the pending chunks
+    """
+    frames = ([profiles] if profiles is not None else []) + pending
+    return pd.concat(frames, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+def stream_sheet_chunks(paths=None, chunk_size=None, readable_id=True, columns=None):
+    """
+    Yield (file, sheet, cleaned DataFrame) for every chunk of every sheet of the
+    given workbooks, defaulting to excel_files. Each chunk goes through the same
+    cleaning stages as a whole sheet; rows without a YEAR are dropped. Sheets
+    whose name holds no year (e.g. notes) are skipped with one warning instead
+    of cleaning every chunk. With columns, only those are read besides the ones
+    cleaning needs (see read_columns).
+    """
+    from workbook_reader import CHUNK_SIZE, iter_sheet_chunks
+
+    usecols = column_filter(read_columns(columns))
+    for file in (excel_files if paths is None else paths):
+        try:
+            chunks = iter_sheet_chunks(file, chunk_size=chunk_size or CHUNK_SIZE, usecols=usecols)
+            years = {}
+            for sheet, df in chunks:
+                if sheet not in years:
+                    years[sheet] = extract_year_from_sheet(sheet)
+                    if years[sheet] is None:
+                        logger.warning("Skipping %s (%s), which has no year in its name", sheet, file)
+                if years[sheet] is None:
+                    continue
+                with stage('clean_chunk', source=f"{file}:{sheet}", rows_in=len(df)) as record:
+                    df = process_sheet(df, sheet, file, readable_id=readable_id)
+                    if 'YEAR' in df.columns:
+                        df = df[df['YEAR'].notna()]
+                    record['rows_out'] = len(df)
+                yield file, sheet, df
+        except Exception as e:
+            logger.error("Error reading %s: %s", file, e)
+
+
+def stream_aggregates(paths=None, chunk_size=None, readable_id=True, resolve_entities=True):
+    """
+    Build the aggregation cube (and resolve people) without ever holding a
+    whole sheet or the combined frame in memory.
+
+    Between chunks, only a CellAccumulator of the distinct (cell, STUDENT_KEY)
+    pairs and, with resolve_entities, the distinct normalized person profiles
+    per YEAR and COURSE are kept. Both grow with the number of distinct
+    students, not with the chunk size or the number of columns read. The
+    pairs take about 24 bytes each. The profiles hold strings; records of
+    the same person share one.
+
+    Returns (cube, profiles): the distinct PROFILE_COLUMNS with their PERSON_ID,
+    enough for entity_resolution.count_people by YEAR and COURSE. profiles is
+    None without resolve_entities. Columns used by neither are not read.
+    """
+    columns = CELL_COLUMNS + (MATCH_COLUMNS if resolve_entities else [])
+    cells = CellAccumulator()
+    profiles = None
+    pending_profiles = []
+    pending_rows = n_rows = n_chunks = 0
+    sheets = set()
+    skipped = set()
+    for file, sheet, df in stream_sheet_chunks(paths, chunk_size=chunk_size, readable_id=readable_id,
+                                               columns=columns):
+        sheets.add((file, sheet))
+        if any(column not in df.columns for column in CELL_COLUMNS):
+            if (file, sheet) not in skipped:
+                logger.warning("Skipping %s (%s), which lacks the columns of the cube", sheet, file)
+                skipped.add((file, sheet))
+            continue
+        with stage('accumulate_chunk', source=f"{file}:{sheet}", rows_in=len(df)) as record:
+            n_rows += len(df)
+            n_chunks += 1
+            cells.add(df)
+            if resolve_entities:
+                chunk_profiles = pd.concat([_as_object(df[['YEAR', 'COURSE']]), normalize_profiles(df)], axis=1)
+                pending_profiles.append(chunk_profiles.drop_duplicates())
+                pending_rows += len(pending_profiles[-1])
+                # Merged like the cells, once the pending rows outnumber the distinct ones
+                if pending_rows >= max(len(profiles) if profiles is not None else 0, MIN_MERGE_ROWS):
+                    profiles, pending_profiles, pending_rows = _merge_profiles(profiles, pending_profiles), [], 0
+            record['rows_out'] = len(cells.keys) + cells.pending_rows
+
+    logger.info("Streamed %d rows in %d chunks from %d sheets", n_rows, n_chunks, len(sheets))
+
+    # Same figures as check_combination_uniqueness on the combined frame
+    duplicate_count = cells.duplicate_count()
+    logger.info("Duplicate combinations: %d of %d records", duplicate_count, n_rows)
+    if duplicate_count > 0:
+        logger.warning("%d records share their combination with another record", duplicate_count)
+
+    cube = build_cube(cells.frame())
+    if resolve_entities and (profiles is not None or pending_profiles):
+        profiles = _merge_profiles(profiles, pending_profiles)
+        profiles[PERSON_COLUMN] = resolve_people(profiles, profiles=profiles)
+    return cube, profiles
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from aggregates import CUBE_DIMENSIONS, INCOME_TABLE_VALUES, TABLE_KEYS, build_cube, update_aggregates
+from extract_excel_data import KEY_COLUMN, combine_sheets
+
+
+def _sheet(year, course, incomes, fingerprint):
+    n_rows = len(incomes)
+    df = pd.DataFrame({
+        'YEAR': [year] * n_rows,
+        'COURSE': [course] * n_rows,
+        'DURATION': ['3 Months'] * n_rows,
+        'GENDER': ['Female'] * n_rows,
+        'EMPLOYMENT_STATUS': ['Employed' if income else 'Not Employed' for income in incomes],
+        'PRESENT_STATUS': ['Other'] * n_rows,
+        KEY_COLUMN: [hash((year, course, i)) for i in range(n_rows)],
+        'INCOME': pd.array(incomes, dtype='Float64'),
+    })
+    df.attrs['fingerprint'] = fingerprint
+    return df
+
+
+def _assert_income_tables(cube):
+    for name, values in INCOME_TABLE_VALUES.items():
+        assert list(cube[name].columns) == TABLE_KEYS[name] + values
+
+
+def test_build_cube_on_empty_frame():
+    cube = build_cube(_sheet('2023-2024', 'Tally', [], '1'))
+    _assert_income_tables(cube)
+    assert cube['counts'].empty and cube['income_quantiles'].empty
+
+
+def test_build_cube_without_earners():
+    cube = build_cube(_sheet('2023-2024', 'Tally', [0.0, None, 0.0], '1'))
+    _assert_income_tables(cube)
+    assert cube['income_quantiles'].empty
+    assert cube['income_bands']['STUDENTS'].sum() == 3
+
+
+def test_rebuild_after_removing_a_workbook(tmp_path):
+    sheets = {'a.xlsx_2023': _sheet('2023-2024', 'Tally', [8000.0, 0.0], '1'),
+              'b.xlsx_2023': _sheet('2023-2024', 'NIIT', [12000.0, None], '2')}
+    update_aggregates(sheets, combine_sheets(sheets), cache_dir=str(tmp_path))
+
+    # The NIIT partition is recomputed from an empty slice
+    del sheets['b.xlsx_2023']
+    cube = update_aggregates(sheets, combine_sheets(sheets), cache_dir=str(tmp_path))
+    _assert_income_tables(cube)
+    for name in ['counts', 'income_bands', 'income_quantiles']:
+        assert set(cube[name]['COURSE']) == {'Tally'}
+    assert cube['counts'][CUBE_DIMENSIONS + ['STUDENTS']].equals(
+        build_cube(combine_sheets(sheets))['counts'][CUBE_DIMENSIONS + ['STUDENTS']])
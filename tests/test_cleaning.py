@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import extract_excel_data
+import legacy_cleaning
+
+# Messy values seen in the workbooks, with spellings the mapping tables do not know
+COURSES = ['BASIC SKILLS', 'Basic Skill', '        Basic Skill', ' Tally ', 'TALLY', 'DIT', 'Excel', '', 12, np.nan]
+DURATIONS = ['3 months', '3 Month ', '6 month', '12 Months', '1 year', '2 Years', '', 6, np.nan]
+RELATIONS = ['S/O', 'D/O', 'W/O', 'H/O', 'Son of', 'Wife of', 'C/O', '', 'Daughter of', 'Husband of']
+NAMES = ['Ram', 'Shyam', 'Sonu', 'Hari', 'Mohan', 'Husband Lal', 'Mason']
+# Incomes on which the digit rule and the parsed income agree (see test_employment_rule_changes)
+INCOMES = ['8000', 'Rs. 12,000/-', 'NIL', None, 0, 15000, 0.0, '', ' ', '10k', 'N/A', '0', 7500.0,
+           '5000-7000', '8 to 10k', '1.5 lakh', 'nil', np.nan]
+STATUS_WORDS = ['Student', 'pursuing B.Com', 'B.Sc.', 'IGNOU', 'Home maker', 'Homermaker', 'home-maker',
+                'Seeking jobs in retail', 'Looking for work', 'Jobless', 'Unemployed', 'Working', 'Tailor',
+                'NA', 'Duty', 'Class 12', 'Housewife', '']
+
+
+def _frame(n_rows=20000, seed=0):
+    rng = random.Random(seed)
+    fathers = [f"{rng.choice(RELATIONS)} {rng.choice(NAMES)}".strip() for _ in range(500)] + [np.nan, 12]
+    statuses = [' '.join(rng.sample(STATUS_WORDS, rng.randint(0, 2))) for _ in range(500)] + [np.nan]
+    return pd.DataFrame({
+        'COURSE': [rng.choice(COURSES) for _ in range(n_rows)],
+        'DURATION': [rng.choice(DURATIONS) for _ in range(n_rows)],
+        'FATHER_HUSBAND': [rng.choice(fathers) for _ in range(n_rows)],
+        'MONTHLY_INCOME': [rng.choice(INCOMES) for _ in range(n_rows)],
+        'CURRENT_STATUS': [rng.choice(statuses) for _ in range(n_rows)],
+    })
+
+
+@pytest.mark.parametrize('name, column', [
+    ('clean_course_names', 'COURSE'),
+    ('clean_duration', 'DURATION'),
+    ('extract_gender', 'GENDER'),
+    ('add_employment_status', 'EMPLOYMENT_STATUS'),
+])
+def test_matches_row_wise(name, column):
+    df = _frame()
+    expected = getattr(legacy_cleaning, name)(df.copy())[column]
+    result = getattr(extract_excel_data, name)(df.copy())[column]
+    # The vectorized functions emit Categorical columns; compare the values
+    pd.testing.assert_series_equal(result.astype(object), expected.astype(object))
+
+
+def test_present_status_matches_row_wise():
+    # Both see the same EMPLOYMENT_STATUS, as after add_employment_status in the pipeline
+    df = legacy_cleaning.add_employment_status(_frame())
+    expected = legacy_cleaning.add_present_status(df.copy())['PRESENT_STATUS']
+    result = extract_excel_data.add_present_status(df.copy())['PRESENT_STATUS']
+    pd.testing.assert_series_equal(result.astype(object), expected.astype(object))
+
+
+def test_employment_rule_changes():
+    # Employment follows the first amount of MONTHLY_INCOME, not any nonzero digit
+    df = pd.DataFrame({'MONTHLY_INCOME': ['abc 0 1', '0.5', 'Class 10 pass', 'NIL 2020']})
+    legacy = legacy_cleaning.add_employment_status(df.copy())['EMPLOYMENT_STATUS']
+    result = extract_excel_data.add_employment_status(df.copy())['EMPLOYMENT_STATUS']
+    assert legacy.tolist() == ['Employed', 'Employed', 'Employed', 'Employed']
+    assert result.astype(object).tolist() == ['Not Employed', 'Employed', 'Employed', 'Employed']
@@ -0,0 +1,42 @@
+import sqlite3
+
+import pandas as pd
+
+from store import sync_sheets
+
+
+def _sheet(students, fingerprint):
+    df = pd.DataFrame({'UNIQUE_ID': [f'id-{student}' for student in students], 'STUDENT': students})
+    df.attrs['fingerprint'] = fingerprint
+    return df
+
+
+def _sources(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute('SELECT SOURCE, COUNT(*) FROM records GROUP BY SOURCE'))
+    finally:
+        conn.close()
+
+
+def test_sync_keeps_other_workbooks(tmp_path):
+    path = str(tmp_path / 'students.db')
+    sync_sheets({'a.xlsx_2023': _sheet(['x', 'y'], '1'), 'a.xlsx_2024': _sheet(['z'], '2')}, path, files=['a.xlsx'])
+    sync_sheets({'b.xlsx_2023': _sheet(['w'], '3')}, path, files=['b.xlsx'])
+    assert _sources(path) == {'a.xlsx_2023': 2, 'a.xlsx_2024': 1, 'b.xlsx_2023': 1}
+
+    # A sheet removed from a synced workbook goes; the other workbook stays
+    sync_sheets({'a.xlsx_2023': _sheet(['x', 'y'], '1')}, path, files=['a.xlsx'])
+    assert _sources(path) == {'a.xlsx_2023': 2, 'b.xlsx_2023': 1}
+
+    # A workbook among the inputs that yielded no sheets is not pruned, nor is anything without files
+    sync_sheets({}, path, files=['a.xlsx', 'b.xlsx'])
+    sync_sheets({'b.xlsx_2024': _sheet(['v'], '4')}, path)
+    assert _sources(path) == {'a.xlsx_2023': 2, 'b.xlsx_2023': 1, 'b.xlsx_2024': 1}
+
+
+def test_sync_matches_the_longest_file(tmp_path):
+    path = str(tmp_path / 'students.db')
+    sync_sheets({'a.xlsx_old.xlsx_2023': _sheet(['x'], '1')}, path, files=['a.xlsx_old.xlsx'])
+    sync_sheets({'a.xlsx_2023': _sheet(['y'], '2')}, path, files=['a.xlsx'])
+    assert _sources(path) == {'a.xlsx_old.xlsx_2023': 1, 'a.xlsx_2023': 1}
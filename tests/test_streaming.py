@@ -0,0 +1,116 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import streaming
+from aggregates import CUBE_DIMENSIONS, build_cube
+from entity_resolution import count_people
+from extract_excel_data import KEY_COLUMN
+from generate_charts import load_aggregates
+from streaming import CellAccumulator, stream_aggregates
+
+
+def _roster(n_rows, seed=0):
+    """
+    Raw roster rows with repeated students, missing values and income text
+    """
+    rng = np.random.default_rng(seed)
+    students = rng.integers(0, n_rows // 3, n_rows)
+    return pd.DataFrame({
+        'ADM NO': students,
+        'STUDENT': [f'Student {i}' for i in students],
+        'FATHER/HUSBAND': rng.choice(['S/O Ram', 'D/O Shyam', 'W/O Hari', None], n_rows),
+        'COURSE': rng.choice(['Tally', 'DTP', 'BASIC SKILLS', 'Excel', None], n_rows),
+        'DURATION': rng.choice(['3 months', '6 Months', '1 year', None], n_rows),
+        'MOB': [f'98{i % 1000:08d}' for i in students],
+        'E-MAIL': [f's{i}@x.com' for i in students],
+        'CURRENT STATUS': rng.choice(['Student', 'Home maker', 'Seeking job', ''], n_rows),
+        'MONTHLY INCOME': rng.choice(['8000', 'NIL', '10k', None, 'Rs. 12,000/-', '1 lakh'], n_rows),
+    })
+
+
+def _sorted(table):
+    table = table.astype(object).where(table.notna(), None)
+    return table.sort_values(list(table.columns), key=lambda column: column.astype(str)).reset_index(drop=True)
+
+
+@pytest.fixture
+def roster_files(tmp_path):
+    paths = []
+    for i, name in enumerate(['Batch 2022-23.csv', 'Batch 2023-24.csv']):
+        path = tmp_path / name
+        _roster(3000, seed=i).to_csv(path, index=False)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('chunk_size', [250, 5000])
+def test_stream_matches_batch(roster_files, monkeypatch, chunk_size):
+    # Merge often so the pending/distinct bookkeeping is exercised
+    monkeypatch.setattr(streaming, 'MIN_MERGE_ROWS', 100)
+    batch, batch_people = load_aggregates(roster_files, use_cache=False)
+    cube, profiles = stream_aggregates(roster_files, chunk_size=chunk_size)
+
+    assert set(cube) == set(batch)
+    for name in batch:
+        pd.testing.assert_frame_equal(_sorted(cube[name]), _sorted(batch[name]), check_dtype=False)
+    for by in (['YEAR'], ['COURSE', 'YEAR']):
+        pd.testing.assert_frame_equal(_sorted(count_people(profiles, by=by)),
+                                      _sorted(count_people(batch_people, by=by)), check_dtype=False)
+
+
+def test_sheet_without_year_warns_once(tmp_path, caplog):
+    path = tmp_path / 'Notes.csv'
+    _roster(300).to_csv(path, index=False)
+    with caplog.at_level('WARNING'):
+        chunks = list(streaming.stream_sheet_chunks([str(path)], chunk_size=37))
+    assert chunks == []
+    assert [record.getMessage() for record in caplog.records] == [
+        f"Skipping Notes ({path}), which has no year in its name"]
+
+
+def _chunk(keys, seed):
+    rng = np.random.default_rng(seed)
+    n_rows = len(keys)
+    df = pd.DataFrame({column: rng.choice(['a', 'b'], n_rows) for column in CUBE_DIMENSIONS})
+    df[KEY_COLUMN] = keys
+    df['INCOME'] = pd.array(rng.choice([0.0, 8000.0, np.nan], n_rows), dtype='Float64')
+    return df
+
+
+def test_accumulator_matches_build_cube():
+    chunks = [_chunk(np.random.default_rng(i).integers(0, 500, 1000), seed=i) for i in range(20)]
+    cells = CellAccumulator()
+    for df in chunks:
+        cells.add(df)
+    combined = pd.concat(chunks, ignore_index=True)
+    expected = build_cube(combined)
+    cube = build_cube(cells.frame())
+    for name in expected:
+        pd.testing.assert_frame_equal(_sorted(cube[name]), _sorted(expected[name]), check_dtype=False)
+    counts = combined[KEY_COLUMN].value_counts()
+    assert cells.duplicate_count() == counts[counts > 1].sum()
+
+
+def test_accumulator_memory_grows_with_distinct_pairs_not_rows():
+    # 200 chunks of 1,000 records of the same 5,000 students
+    keys = np.arange(5000, dtype=np.int64)
+    chunks = [_chunk(np.resize(np.roll(keys, 1000 * i), 1000), seed=0) for i in range(200)]
+    cells = CellAccumulator()
+    tracemalloc.start()
+    try:
+        for df in chunks:
+            cells.add(df)
+        cells.merge()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(cells.keys) == len(np.unique(np.stack([cells.keys, cells.codes]), axis=1)[0])
+    assert cells.records.sum() == 200 * 1000
+    # The pairs themselves: about 24 bytes each for at most 5,000 x 64 cells
+    assert cells.keys.nbytes + cells.codes.nbytes + cells.incomes.nbytes + cells.records.nbytes < 24 * 5000 * 2
+    # 200,000 records folded in well under what they take as a frame
+    assert peak < sum(df.memory_usage(deep=True).sum() for df in chunks) / 4
@@ -0,0 +1,256 @@
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from entity_resolution import normalize_email, normalize_mobile
+from extract_excel_data import COURSE_MAPPING, DURATION_MAPPING, add_arguments, load_sheet_data, resolve_inputs
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# Columns the rules check; a column projection must keep them
+VALIDATION_COLUMNS = ['ADM_NO', 'MOBILE', 'EMAIL', 'YEAR', 'COURSE', 'DURATION', 'GENDER']
+
+# Columns of the report, in order
+REPORT_COLUMNS = ['SOURCE', 'COLUMN', 'RULE', 'SEVERITY', 'ROWS', 'VIOLATIONS', 'EXAMPLES']
+
+# SOURCE of the report rows summing a rule over every sheet
+TOTAL_SOURCE = 'TOTAL'
+
+# Distinct offending values shown per report row, with missing values as MISSING
+MAX_EXAMPLES = 3
+MISSING = '(missing)'
+
+# Academic years as written by add_year, e.g. '2023-2024'
+YEAR_PATTERN = r'^(?P<start>\d{4})-(?P<end>\d{4})$'
+
+
+def _blank(values):
+    """
+    True for missing values and empty or whitespace-only text
+    """
+    return values.isna() | values.astype(str).str.strip().eq('')
+
+
+def invalid_mobile(values):
+    """
+    Values present but not a 10-digit mobile number starting with 6-9,
+    optionally after +91 or 0 and with spaces or dashes (see normalize_mobile)
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        # Numbers read from the sheets: compare ranges instead of parsing their text
+        numbers = values.astype('float64')
+        valid = numbers.between(6e9, 1e10 - 1) | numbers.between(916e9, 92e10 - 1)
+        return values.notna() & ~valid
+    return ~_blank(values) & normalize_mobile(values).isna()
+
+
+def invalid_email(values):
+    """
+    Values present but not of the form name@domain.tld
+    """
+    return ~_blank(values) & normalize_email(values).isna()
+
+
+def missing_value(values):
+    return _blank(values)
+
+
+def unparseable_year(values):
+    """
+    YEARs missing or not two consecutive years, e.g. from a sheet name that
+    extract_year_from_sheet cannot read or reads wrongly
+    """
+    parts = values.astype(str).str.extract(YEAR_PATTERN)
+    start = pd.to_numeric(parts['start'])
+    end = pd.to_numeric(parts['end'])
+    return values.isna() | ~(end - start).eq(1)
+
+
+def _not_in(allowed):
+    """
+    Check flagging the values that are not one of `allowed`, e.g. course names
+    left as they were because the mapping table does not know them
+    """
+    allowed = frozenset(allowed)
+
+    def check(values):
+        return ~values.astype(str).isin(allowed) | values.isna()
+    return check
+
+
+def unknown_gender(values):
+    return values.astype(str).eq('Unknown')
+
+
+# Rules run by validate_sheets: name -> (column, severity, check). A check takes
+# the distinct values of the column (in its dtype, object for categorical
+# columns) and returns a boolean Series, True where a
+# value breaks the rule. A sheet without the column is checked as all missing.
+# Violations of 'error' rules fail the validation gate.
+RULES = {
+    'invalid_mobile': ('MOBILE', 'warning', invalid_mobile),
+    'invalid_email': ('EMAIL', 'warning', invalid_email),
+    'missing_adm_no': ('ADM_NO', 'warning', missing_value),
+    'unparseable_year': ('YEAR', 'error', unparseable_year),
+    'unmapped_course': ('COURSE', 'error', _not_in(COURSE_MAPPING.values())),
+    'unmapped_duration': ('DURATION', 'error', _not_in(DURATION_MAPPING.values())),
+    'unknown_gender': ('GENDER', 'warning', unknown_gender),
+}
+
+
+def _check_unique(series, check):
+    """
+    Run a check over the distinct values of a Series only. Returns the number
+    of violating rows and the violating values, in order of first appearance.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # The categories are the distinct values already; missing values get an extra code
+        categories = series.cat.categories
+        codes = np.where(series.cat.codes.to_numpy() < 0, len(categories), series.cat.codes.to_numpy())
+        uniques = pd.Series(list(categories) + [np.nan], dtype=object)
+    else:
+        codes, uniques = pd.factorize(series.to_numpy(), use_na_sentinel=False)
+        uniques = pd.Series(uniques)
+    rows = np.bincount(codes, minlength=len(uniques))
+    violating = np.asarray(check(uniques), dtype=bool) & (rows > 0)
+    values = uniques[violating]
+    return int(rows[violating].sum()), values.map(str).where(values.notna(), MISSING).tolist()
+
+
+def validate_frame(df, source, rules=None):
+    """
+    Report rows (see REPORT_COLUMNS) of one cleaned sheet, one per rule of
+    `rules` (default RULES) it breaks
+    """
+    rules = RULES if rules is None else rules
+    rows = []
+    for rule, (column, severity, check) in rules.items():
+        series = df[column] if column in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+        count, values = _check_unique(series, check)
+        if count:
+            rows.append({'SOURCE': source, 'COLUMN': column, 'RULE': rule, 'SEVERITY': severity, 'ROWS': len(df),
+                         'VIOLATIONS': count, 'EXAMPLES': values[:MAX_EXAMPLES]})
+    return rows
+
+
+def validate_sheets(sheet_data, rules=None):
+    """
+    Run the validation rules over every cleaned sheet. Returns the report: a
+    row per sheet and broken rule, then a TOTAL row per rule over all sheets
+    (with 0 violations for the rules every sheet passes).
+
+    Each check runs on the distinct values of a column only, so a sheet costs
+    one factorize per rule however many rows it has. Examples are kept as a
+    ' | '-separated string of at most MAX_EXAMPLES distinct values.
+    """
+    rules = RULES if rules is None else rules
+    total_rows = sum(len(df) for df in sheet_data.values())
+    with stage('validate', rows_in=total_rows) as record:
+        rows = []
+        for source, df in sheet_data.items():
+            rows.extend(validate_frame(df, source, rules))
+        for rule, (column, severity, _) in rules.items():
+            broken = [row for row in rows if row['RULE'] == rule]
+            examples = list(dict.fromkeys(value for row in broken for value in row['EXAMPLES']))
+            rows.append({'SOURCE': TOTAL_SOURCE, 'COLUMN': column, 'RULE': rule, 'SEVERITY': severity,
+                         'ROWS': total_rows, 'VIOLATIONS': sum(row['VIOLATIONS'] for row in broken),
+                         'EXAMPLES': examples[:MAX_EXAMPLES]})
+        report = pd.DataFrame(rows, columns=REPORT_COLUMNS)
+        report['EXAMPLES'] = report['EXAMPLES'].map(' | '.join)
+        record['rows_out'] = int(report.loc[report['SOURCE'] == TOTAL_SOURCE, 'VIOLATIONS'].sum())
+    return report
+
+
+def write_report(report, path):
+    """
+    Write the report for spreadsheets or other tools: JSON records for a .json
+    path, CSV for anything else
+    """
+    if os.path.splitext(path)[1].lower() == '.json':
+        report.to_json(path, orient='records', indent=2)
+    else:
+        report.to_csv(path, index=False)
+    logger.info("Validation report (%d rows) written to '%s'", len(report), path)
+
+
+def log_report(report):
+    """
+    Log the rules broken over all sheets, errors first
+    """
+    totals = report[(report['SOURCE'] == TOTAL_SOURCE) & (report['VIOLATIONS'] > 0)]
+    if totals.empty:
+        logger.info("✓ Every validation rule passes")
+        return
+    logger.info("=== Validation Results ===")
+    for row in totals.sort_values(['SEVERITY', 'VIOLATIONS'], ascending=[True, False]).itertuples(index=False):
+        log = logger.error if row.SEVERITY == 'error' else logger.warning
+        sheets = int(((report['RULE'] == row.RULE) & (report['SOURCE'] != TOTAL_SOURCE)).sum())
+        log("%s (%s): %d of %d rows in %d sheets, e.g. %s", row.RULE, row.COLUMN, row.VIOLATIONS, row.ROWS,
+            sheets, row.EXAMPLES)
+
+
+def failures(report, max_violations=0):
+    """
+    TOTAL rows of the 'error' rules with more than max_violations violating rows
+    """
+    totals = report[(report['SOURCE'] == TOTAL_SOURCE) & (report['SEVERITY'] == 'error')]
+    return totals[totals['VIOLATIONS'] > max_violations]
+
+
+class ValidationFailed(ValueError):
+    """
+    Raised by check_sheets when the data breaks the 'error' rules
+    """
+
+
+def check_sheets(sheet_data, report_path=None, max_violations=0):
+    """
+    Validation gate run before the charts: validate the cleaned sheets, log
+    the result, write the report to report_path if given, and raise
+    ValidationFailed when an 'error' rule has more than max_violations
+    violating rows. Returns the report.
+    """
+    report = validate_sheets(sheet_data)
+    log_report(report)
+    if report_path:
+        write_report(report, report_path)
+    failed = failures(report, max_violations)
+    if not failed.empty:
+        raise ValidationFailed("Validation failed: " + ', '.join(
+            f'{row.RULE} ({row.VIOLATIONS} rows)' for row in failed.itertuples(index=False)))
+    return report
+
+
+def main(argv=None):
+    """
+    Command line entry point: validate the cleaned records and write the report.
+    Exits with status 1 when an 'error' rule fails, so it can gate other steps.
+    """
+    parser = argparse.ArgumentParser(description="Check the cleaned records against the validation rules")
+    parser.add_argument('--validation-report', metavar='PATH',
+                        help='Write the validation report to PATH (.csv or .json)')
+    parser.add_argument('--max-violations', type=int, default=0, metavar='ROWS',
+                        help="Rows an 'error' rule may break before the validation fails (default: 0)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start_run(args)
+
+    sheet_data = load_sheet_data(resolve_inputs(args.files, args.inputs_file), workers=args.workers,
+                                 use_cache=not args.no_cache, readable_id=not args.no_readable_id,
+                                 columns=VALIDATION_COLUMNS)
+    try:
+        check_sheets(sheet_data, args.validation_report, args.max_violations)
+    except ValidationFailed as e:
+        logger.error("%s", e)
+        parser.exit(1)
+    finally:
+        instrumentation.finish_run(args)
+
+
+if __name__ == "__main__":
+    main()
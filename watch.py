@@ -0,0 +1,111 @@
+import logging
+import os
+import time
+
+from extract_excel_data import resolve_inputs
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two looks at the inputs
+POLL_INTERVAL = 1.0
+
+# Seconds the inputs must stay unchanged before a rebuild, so a burst of saves
+# (or a file still being copied) triggers one rebuild on the final version
+DEBOUNCE_SECONDS = 2.0
+
+
+def _is_temporary(path):
+    """
+    Lock and temporary files of Excel and LibreOffice, e.g. '~$Batch.xlsx'
+    """
+    name = os.path.basename(path)
+    return name.startswith('~$') or name.startswith('.~lock')
+
+
+def snapshot(patterns=None, inputs_file=None, previous_paths=None):
+    """
+    Dict of input path -> (size, mtime_ns), or None for a missing file.
+
+    Glob patterns and the inputs file are resolved again on every call, so new
+    files matching a pattern are picked up. The inputs file itself is part of
+    the snapshot. If it cannot be parsed (e.g. while it is being saved),
+    previous_paths are used instead.
+    """
+    try:
+        paths = resolve_inputs(patterns, inputs_file)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not resolve the inputs, keeping the previous ones: %s", e)
+        paths = list(previous_paths or [])
+    if inputs_file:
+        paths = paths + [inputs_file]
+
+    state = {}
+    for path in paths:
+        if _is_temporary(path):
+            continue
+        try:
+            stat = os.stat(path)
+            state[path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            state[path] = None
+    return state
+
+
+def describe_changes(previous, current):
+    """
+    Sorted list of 'added: x', 'removed: x' and 'modified: x' entries
+    """
+    changes = [f'added: {path}' for path in current if path not in previous]
+    changes += [f'removed: {path}' for path in previous if path not in current]
+    changes += [f'modified: {path}' for path in current if path in previous and current[path] != previous[path]]
+    return sorted(changes)
+
+
+def wait_for_change(previous, patterns=None, inputs_file=None, interval=POLL_INTERVAL, debounce=DEBOUNCE_SECONDS):
+    """
+    Poll the inputs every `interval` seconds until they differ from the previous
+    snapshot and have then stayed the same for `debounce` seconds.
+    Returns the new snapshot.
+    """
+    current = previous
+    while current == previous:
+        time.sleep(interval)
+        current = snapshot(patterns, inputs_file, previous_paths=previous)
+
+    settled_at = time.monotonic()
+    while time.monotonic() - settled_at < debounce:
+        time.sleep(min(interval, debounce))
+        latest = snapshot(patterns, inputs_file, previous_paths=current)
+        if latest != current:
+            current = latest
+            settled_at = time.monotonic()
+    return current
+
+
+def watch(rebuild, patterns=None, inputs_file=None, interval=POLL_INTERVAL, debounce=DEBOUNCE_SECONDS):
+    """
+    Call rebuild(paths) with the resolved input paths now and again after every
+    settled change of the inputs, until interrupted with Ctrl+C.
+
+    Polling file sizes and modification times needs no extra services. The
+    process stays alive between rebuilds, so imports and the memoized sheets
+    are reused, and the sheet cache limits each rebuild to the sheets whose
+    data changed. A failed rebuild is logged and the watch goes on.
+    """
+    current = snapshot(patterns, inputs_file)
+    try:
+        while True:
+            paths = [path for path in current if path != inputs_file]
+            started = time.perf_counter()
+            try:
+                rebuild(paths)
+                logger.info("Rebuilt in %.2fs, watching %d inputs for changes", time.perf_counter() - started,
+                            len(paths))
+            except Exception:
+                logger.exception("Rebuild failed, waiting for the next change")
+            previous = current
+            current = wait_for_change(previous, patterns, inputs_file, interval=interval, debounce=debounce)
+            for change in describe_changes(previous, current):
+                logger.info("  %s", change)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
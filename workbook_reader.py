@@ -0,0 +1,215 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+# calamine is optional; pandas imports it itself when the engine is used
+HAS_CALAMINE = importlib.util.find_spec('python_calamine') is not None
+
+# pyarrow is optional; it parses CSV with several threads and is needed for Parquet
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Input formats by file extension. A CSV or Parquet file holds a single roster
+# whose "sheet" name is the file name without its extension, so the academic
+# year is taken from names like "Batch 2023-24.csv".
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+CSV_EXTENSIONS = ('.csv',)
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+
+def input_format(file):
+    """
+    'excel', 'csv' or 'parquet' for a file name, by extension; anything
+    unknown is treated as a workbook
+    """
+    extension = os.path.splitext(file)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return 'csv'
+    if extension in PARQUET_EXTENSIONS:
+        return 'parquet'
+    return 'excel'
+
+
+def single_sheet_name(file):
+    """
+    Sheet name standing for the one roster of a CSV or Parquet file
+    """
+    return os.path.splitext(os.path.basename(file))[0]
+
+
+def read_csv(file, **options):
+    """
+    Read a CSV roster, with the multithreaded pyarrow parser when it is installed
+    """
+    if HAS_PYARROW and 'chunksize' not in options:
+        if callable(options.get('usecols')):
+            # The pyarrow parser only takes a list of names; resolve them from the header
+            header = pd.read_csv(file, nrows=0).columns
+            options['usecols'] = [name for name in header if options['usecols'](name)]
+        return pd.read_csv(file, engine='pyarrow', **options)
+    return pd.read_csv(file, **options)
+
+
+def _parquet_columns(file, usecols):
+    """
+    Names of the Parquet columns selected by a usecols callable, read from the schema
+    """
+    if usecols is None:
+        return None
+    import pyarrow.parquet as pq
+
+    return [name for name in pq.read_schema(file).names if usecols(name)]
+
+
+def read_parquet(file, usecols=None):
+    """
+    Read a Parquet roster; with usecols, only the columns it accepts
+    """
+    return pd.read_parquet(file, columns=_parquet_columns(file, usecols))
+
+
+def sheet_names(file):
+    """
+    Names of the sheets of an input file: every worksheet of a workbook, or the
+    single roster of a CSV or Parquet file
+    """
+    if input_format(file) != 'excel':
+        return [single_sheet_name(file)]
+    with open_workbook(file) as xls:
+        return xls.sheet_names
+
+
+def excel_engine():
+    """
+    Pick the fastest installed engine for reading .xlsx files
+    """
+    # calamine (Rust) parses several times faster than openpyxl; pandas >= 2.2 supports it
+    return 'calamine' if HAS_CALAMINE else 'openpyxl'
+
+
+def open_workbook(file, engine=None):
+    """
+    Open a workbook once so all of its sheets can be read through the same handle
+    """
+    engine = engine or excel_engine()
+    try:
+        return pd.ExcelFile(file, engine=engine)
+    except ValueError:
+        if engine == 'openpyxl':
+            raise
+        # Older pandas without the calamine engine
+        return pd.ExcelFile(file, engine='openpyxl')
+
+
+def read_workbook_sheets(file, sheet_names=None, engine=None, usecols=None):
+    """
+    Yield (sheet_name, DataFrame) for each requested sheet of a workbook.
+
+    The workbook is opened and unzipped once instead of once per sheet. With
+    openpyxl, pandas loads it in read-only streaming mode. CSV and Parquet
+    files yield their single roster without any Excel parsing.
+
+    usecols is a callable taking a raw column name; only the columns it
+    accepts end up in the DataFrames. Parquet and CSV readers skip the
+    others entirely; the Excel readers drop them before building the frame.
+    """
+    file_format = input_format(file)
+    if file_format == 'csv':
+        yield single_sheet_name(file), read_csv(file, usecols=usecols)
+        return
+    if file_format == 'parquet':
+        yield single_sheet_name(file), read_parquet(file, usecols=usecols)
+        return
+    with open_workbook(file, engine=engine) as xls:
+        if sheet_names is None:
+            sheet_names = xls.sheet_names
+        for sheet in sheet_names:
+            yield sheet, xls.parse(sheet_name=sheet, usecols=usecols)
+
+
+# Rows per DataFrame yielded by iter_sheet_chunks
+CHUNK_SIZE = 50_000
+
+
+def _cell_value(value):
+    # pandas' openpyxl reader turns whole-number floats into ints the same way
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _column_names(header):
+    """
+    Column names for a header row the way pandas names them: 'Unnamed: <i>' for
+    empty cells and '.1', '.2' ... suffixes for repeated names
+    """
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f'Unnamed: {i}' if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def iter_sheet_chunks(file, sheet_names=None, chunk_size=CHUNK_SIZE, usecols=None):
+    """
+    Yield (sheet_name, DataFrame) chunks of at most chunk_size rows from each
+    requested sheet of a workbook.
+
+    The workbook is opened with openpyxl in read-only mode and rows are pulled from
+    its iterator, so only one chunk of a sheet is in memory at a time. The first
+    non-empty row is the header and empty rows are skipped, as in pd.read_excel.
+    Columns are kept as object dtype so a value renders the same in every chunk.
+    CSV files are read with pandas' chunked parser and Parquet files one record
+    batch at a time.
+
+    With a usecols callable (see read_workbook_sheets), only the cells of the
+    columns it accepts are kept. Empty rows are still judged on the whole row.
+    """
+    file_format = input_format(file)
+    if file_format == 'csv':
+        with read_csv(file, chunksize=chunk_size, dtype=object, usecols=usecols) as reader:
+            for df in reader:
+                yield single_sheet_name(file), df
+        return
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        with pq.ParquetFile(file) as parquet_file:
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=_parquet_columns(file, usecols)):
+                yield single_sheet_name(file), batch.to_pandas().astype(object)
+        return
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        for sheet in (workbook.sheetnames if sheet_names is None else sheet_names):
+            columns = None
+            keep = None
+            rows = []
+            yielded = False
+            for row in workbook[sheet].iter_rows(values_only=True):
+                if all(value is None for value in row):
+                    continue
+                if columns is None:
+                    header = list(row)
+                    while header and header[-1] is None:
+                        header.pop()
+                    names = _column_names(header)
+                    keep = [i for i, name in enumerate(names) if usecols is None or usecols(name)]
+                    columns = [names[i] for i in keep]
+                    continue
+                rows.append([_cell_value(row[i]) if i < len(row) else None for i in keep])
+                if len(rows) == chunk_size:
+                    yield sheet, pd.DataFrame(rows, columns=columns, dtype=object)
+                    rows = []
+                    yielded = True
+            if rows or not yielded:
+                yield sheet, pd.DataFrame(rows, columns=columns or [], dtype=object)
+    finally:
+        workbook.close()